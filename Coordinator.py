@@ -0,0 +1,256 @@
+# Date format modules
+import datetime
+
+# Process and network modules
+import multiprocessing
+import os
+import queue
+import secrets
+import threading
+import time
+from multiprocessing.managers import BaseManager
+
+# Project modules
+from Worker import AUTHKEY_ENV, run_worker
+
+# Debugging modules
+import logging
+
+class CoordinatorManager(BaseManager):
+    """ Server side of the task and result queues shared with the workers. """
+
+class Coordinator:
+    """
+    There are total 6 functions.
+        split_time_range
+        plan_shards
+        start
+        start_local_workers
+        run
+        stop
+    """
+    def __init__(self, collection_name, vertices_list, address=("127.0.0.1", 0), authkey=None,
+                 device_shards=4, time_shards=1, max_retries=2, shard_timeout=1800, raster_resolution=None,
+                 start_method=None):
+        """
+        Initializes the Coordinator.
+
+        Args:
+            collection_name (str): The MongoDB collection the workers read from.
+            vertices_list (list of list of tuples): A list of polygon vertex sets.
+            address (tuple): (host, port) to listen on for workers. Port 0 picks a free port. Only
+                bind to a non-loopback host when remote workers are expected.
+            authkey (bytes, optional): The shared key workers authenticate with. Defaults to the
+                TRANSIT_COORDINATOR_AUTHKEY environment variable, or a random key for this run.
+            device_shards (int): Number of "CLIMAC" hash shards.
+            time_shards (int): Number of time slices each device shard is split into.
+            max_retries (int): How many times a failed or timed out shard is handed out again.
+            shard_timeout (int): Seconds after which a shard without a result is handed out again.
+            raster_resolution (int, optional): Raster resolution the workers classify areas with.
+            start_method (str, optional): multiprocessing start method for local workers. Defaults to
+                the platform default.
+        """
+        self.collection_name = collection_name
+        self.vertices_list = vertices_list
+        self.address = address
+        self.authkey = authkey or os.environ.get(AUTHKEY_ENV, "").encode() or secrets.token_hex(32).encode()
+        self.device_shards = device_shards
+        self.time_shards = time_shards
+        self.max_retries = max_retries
+        self.shard_timeout = shard_timeout
+        self.raster_resolution = raster_resolution
+        self.context = multiprocessing.get_context(start_method)
+
+        self.task_queue = queue.Queue()
+        self.result_queue = queue.Queue()
+        self.server = None
+        self.workers = []
+
+    @staticmethod
+    def split_time_range(start_datetime, end_datetime, parts):
+        """
+        Splits a datetime range into consecutive slices.
+
+        Slices do not overlap: each one ends one second before the next one starts,
+        matching the inclusive range used by `fetch_data_from_mongo`.
+
+        Args:
+            start_datetime (datetime): The start of the datetime range.
+            end_datetime (datetime): The end of the datetime range.
+            parts (int): The number of slices.
+
+        Returns:
+            list[tuple]: (slice_start, slice_end) pairs.
+        """
+        step = (end_datetime - start_datetime) / parts
+        time_slices = []
+        for i in range(parts):
+            slice_start = start_datetime + step * i
+            if i == parts - 1:
+                slice_end = end_datetime
+            else:
+                slice_end = start_datetime + step * (i + 1) - datetime.timedelta(seconds=1)
+            time_slices.append((slice_start, slice_end))
+        return time_slices
+
+    def plan_shards(self, start_datetime, end_datetime):
+        """
+        Splits a case into shards by device hash and, optionally, by time.
+
+        Args:
+            start_datetime (datetime): The start of the datetime range.
+            end_datetime (datetime): The end of the datetime range.
+
+        Returns:
+            list[dict]: One task per shard.
+        """
+        tasks = []
+        for slice_start, slice_end in self.split_time_range(start_datetime, end_datetime, self.time_shards):
+            for shard_index in range(self.device_shards):
+                tasks.append({
+                    'shard_id': len(tasks),
+                    'collection_name': self.collection_name,
+                    'start_datetime': slice_start,
+                    'end_datetime': slice_end,
+                    'shard': (shard_index, self.device_shards),
+                    'vertices_list': self.vertices_list,
+                    'raster_resolution': self.raster_resolution,
+                })
+        return tasks
+
+    def start(self):
+        """
+        Starts serving the task and result queues so local or remote workers can connect.
+        """
+        CoordinatorManager.register('get_task_queue', callable=lambda: self.task_queue)
+        CoordinatorManager.register('get_result_queue', callable=lambda: self.result_queue)
+        manager = CoordinatorManager(address=self.address, authkey=self.authkey)
+        self.server = manager.get_server()
+        self.address = self.server.address
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        logging.info(f"Coordinator listening for workers on {self.address}.")
+
+    def start_local_workers(self, num_workers):
+        """
+        Starts worker processes on this machine.
+
+        Args:
+            num_workers (int): The number of worker processes to start.
+        """
+        for _ in range(num_workers):
+            process = self.context.Process(target=run_worker, args=(self.address, self.authkey), daemon=True)
+            process.start()
+            self.workers.append(process)
+        logging.info(f"Started {num_workers} local worker processes.")
+
+    def run(self, start_datetime, end_datetime, num_local_workers=0):
+        """
+        Runs a case across the workers and merges their partial aggregates.
+
+        Shards that fail, or do not return within `shard_timeout` after a worker started them, are
+        handed out again up to `max_retries` times; time spent waiting in the queue does not count.
+        Workers announce each shard with their pid before processing it, so when a local worker dies
+        its shard is handed out again right away and the worker is replaced. A shard is never queued
+        again while an earlier copy is still waiting to be picked up. Partial aggregates are merged
+        as they arrive instead of being kept until every shard is done.
+
+        Args:
+            start_datetime (datetime): The start of the datetime range.
+            end_datetime (datetime): The end of the datetime range.
+            num_local_workers (int): Worker processes to start on this machine. Remote workers
+                can connect with `TRANSIT_COORDINATOR_AUTHKEY=<authkey> python Worker.py <host> <port>`
+                at any time.
+
+        Returns:
+            pd.DataFrame: The merged aggregates from `DataProcessor.merge_partial_aggregates`.
+
+        Raises:
+            RuntimeError: If a shard still fails after `max_retries` retries.
+        """
+        from DataProcessor import DataProcessor
+
+        if self.server is None:
+            self.start()
+        self.start_local_workers(num_local_workers)
+
+        tasks = {task['shard_id']: task for task in self.plan_shards(start_datetime, end_datetime)}
+        attempts = {shard_id: 1 for shard_id in tasks}
+        # Copies of each shard waiting in the task queue, and when a worker last started one
+        queued = {shard_id: 1 for shard_id in tasks}
+        started_at = {}
+        for task in tasks.values():
+            self.task_queue.put(task)
+        logging.info(f"Dispatched {len(tasks)} shards.")
+
+        done = set()
+        merged = None
+        running = {}
+        try:
+            while len(done) < len(tasks):
+                retry = []
+                # Drain every message, so a dead worker's "started" message is seen before its death
+                results = []
+                try:
+                    results.append(self.result_queue.get(timeout=1))
+                    while True:
+                        results.append(self.result_queue.get_nowait())
+                except queue.Empty:
+                    pass
+                for result in results:
+                    shard_id = result['shard_id']
+                    if result.get('started'):
+                        running[result['pid']] = shard_id
+                        queued[shard_id] = max(0, queued[shard_id] - 1)
+                        started_at[shard_id] = time.monotonic()
+                        continue
+                    running.pop(result['pid'], None)
+                    if result['ok'] and shard_id not in done:
+                        done.add(shard_id)
+                        partial = result['partial']
+                        merged = partial if merged is None else DataProcessor.merge_partial_aggregates([merged, partial])
+                        logging.info(f"Shard {shard_id} done ({len(done)}/{len(tasks)}), {merged.shape[0]} aggregate rows.")
+                    elif not result['ok'] and shard_id not in done:
+                        logging.warning(f"Shard {shard_id} failed: {result['error']}")
+                        retry.append(shard_id)
+
+                for i, process in enumerate(self.workers):
+                    if not process.is_alive():
+                        shard_id = running.pop(process.pid, None)
+                        if shard_id is not None and shard_id not in done and shard_id not in retry:
+                            logging.warning(f"Local worker {process.pid} died while running shard {shard_id}.")
+                            retry.append(shard_id)
+                        logging.warning(f"Local worker {process.pid} died, starting a replacement.")
+                        self.workers[i] = self.context.Process(target=run_worker, args=(self.address, self.authkey), daemon=True)
+                        self.workers[i].start()
+
+                now = time.monotonic()
+                for shard_id, started in started_at.items():
+                    if shard_id not in done and shard_id not in retry and now - started > self.shard_timeout:
+                        logging.warning(f"Shard {shard_id} timed out after {self.shard_timeout}s.")
+                        retry.append(shard_id)
+
+                for shard_id in retry:
+                    if queued[shard_id] > 0:
+                        continue
+                    if attempts[shard_id] > self.max_retries:
+                        raise RuntimeError(f"Shard {shard_id} failed after {self.max_retries} retries.")
+                    attempts[shard_id] += 1
+                    logging.warning(f"Retrying shard {shard_id} (attempt {attempts[shard_id]}).")
+                    self.task_queue.put(tasks[shard_id])
+                    queued[shard_id] += 1
+                    started_at.pop(shard_id, None)
+        finally:
+            self.stop()
+
+        logging.info(f"All {len(tasks)} shards done.")
+        return merged
+
+    def stop(self):
+        """
+        Sends a stop signal to the local workers and waits for them to exit.
+        """
+        for _ in self.workers:
+            self.task_queue.put(None)
+        for process in self.workers:
+            process.join(timeout=10)
+        self.workers = []
@@ -1,23 +1,51 @@
 # Data manipulation modules
+import numpy as np
 import pandas as pd
+import hashlib
+import math
+
+# Sketch and lookup modules
+from HyperLogLog import HyperLogLog
+from PolygonRaster import PolygonRaster
 
 # Debugging modules
 import logging
 
+# Devices are sampled by hashing "CLIMAC" into this many buckets
+SAMPLE_BUCKETS = 10000
+
 class DataProcessor:
     """
-    There are total 5 functions.
+    There are total 16 functions.
         check_left_area
         parse_position
         is_point_in_polygon
         calculate_first_last_seen
         calculate_transitions_between_areas
+        climac_bucket
+        climac_in_sample
+        sample_by_climac
+        preview_areas
+        get_raster
+        extract_points
+        classify_areas
+        calculate_od_matrix
+        calculate_partial_aggregates
+        merge_partial_aggregates
+        finalize_aggregates
     """
-    def __init__(self):
+    def __init__(self, raster_resolution=None, raster_cache_dir="raster_cache"):
         """
         Initializes the DataProcessor class.
+
+        Args:
+            raster_resolution (int, optional): When given, areas are classified with precomputed
+                `PolygonRaster` lookup tables of this resolution instead of testing every point.
+            raster_cache_dir (str): Directory where rasters are persisted per polygon hash.
         """
-        pass
+        self.raster_resolution = raster_resolution
+        self.raster_cache_dir = raster_cache_dir
+        self.rasters = {}
         
     def check_left_area(self, row, vertices):
         """
@@ -129,10 +157,11 @@ class DataProcessor:
         result_df = result_df.merge(main_last_seen, on='CLIMAC', how='left')
         result_df = result_df.merge(main_total, on='CLIMAC', how='left')
 
+        membership = self.classify_areas(df, vertices_list)
         for index, vertices in enumerate(vertices_list, start=1):
             area_name = f'area{index}'
             
-            df[area_name + '_in'] = df.apply(lambda row: self.check_left_area(row, vertices), axis=1)
+            df[area_name + '_in'] = membership[area_name].map({True: 'in', False: 'out'})
             
             area_in_df = df[df[area_name + '_in'] == 'in']
             first_seen = area_in_df.groupby('CLIMAC')['WINDOW'].min().to_frame(name=f'{area_name}_first_seen')
@@ -179,11 +208,11 @@ class DataProcessor:
         df["WINDOW_START"] = pd.to_datetime(df["WINDOW_START"], unit="s")
         result_df = pd.DataFrame(df['CLIMAC'].unique(), columns=['CLIMAC'])
         
+        membership = self.classify_areas(df, vertices_list)
         for index, vertices in enumerate(vertices_list, start=1):
             area_name = f'area{index}'
-            df[area_name + '_in'] = df.apply(lambda row: self.check_left_area(row, vertices), axis=1)
+            df[area_name + '_in'] = membership[area_name].map({True: 'in', False: 'out'})
             area_in_df = df[df[area_name + '_in'] == 'in']
-            logging.info(f"{area_name} contains {area_in_df.shape[0]} records post filter.")
 
             if area_in_df.empty:
                 logging.warning(f"No records found in area {index} after applying position filter.")
@@ -214,3 +243,345 @@ class DataProcessor:
             logging.warning("No valid sequences found. All data filtered out.")
 
         return valid_sequence
+
+    @staticmethod
+    def climac_bucket(climac, buckets):
+        """
+        Hashes a device identifier into one of a fixed number of buckets.
+
+        Args:
+            climac (str or int): The device identifier.
+            buckets (int): The number of buckets.
+
+        Returns:
+            int: The bucket index, between 0 and `buckets` - 1.
+        """
+        digest = hashlib.md5(str(climac).encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "little") % buckets
+
+    @staticmethod
+    def climac_in_sample(climac, sample_rate):
+        """
+        Decides whether a device belongs to a hash-based sample.
+
+        The decision only depends on the "CLIMAC" value, so a device is either kept with
+        all of its readings or dropped entirely, and the same devices are picked on every run.
+
+        Args:
+            climac (str or int): The device identifier.
+            sample_rate (float): Fraction of devices to keep, between 0 and 1.
+
+        Returns:
+            bool: True if the device is in the sample, otherwise False.
+        """
+        return DataProcessor.climac_bucket(climac, SAMPLE_BUCKETS) < sample_rate * SAMPLE_BUCKETS
+
+    def sample_by_climac(self, df, sample_rate):
+        """
+        Keeps the readings of a hash-based sample of devices.
+
+        Args:
+            df (pd.DataFrame): The input DataFrame with a "CLIMAC" column.
+            sample_rate (float): Fraction of devices to keep, between 0 and 1.
+
+        Returns:
+            pd.DataFrame: The readings of the sampled devices.
+        """
+        if sample_rate >= 1 or df.empty:
+            return df
+        climacs = pd.Series(df["CLIMAC"].unique())
+        sampled = climacs[climacs.map(lambda climac: self.climac_in_sample(climac, sample_rate))]
+        logging.info(f"Sampled {len(sampled)} of {len(climacs)} devices at rate {sample_rate}.")
+        return df[df["CLIMAC"].isin(sampled)].copy()
+
+    def preview_areas(self, df, vertices_list, sample_rate, presampled=False):
+        """
+        Approximate preview of devices per area, transition counts and dwell categories.
+
+        The preview runs `calculate_first_last_seen` on a hash-based sample of devices, so the
+        per-device output keeps the same schema as the exact run with an extra "approximate" flag.
+        Unique devices per area are counted with HyperLogLog sketches and, like the transition
+        and category counts, scaled up by the sample rate. Transitions follow the same ordered
+        chain as `calculate_transitions_between_areas`. Bounds are 95% intervals combining the
+        sampling error and the sketch error.
+
+        Args:
+            df (pd.DataFrame): Input DataFrame containing positional data, see `calculate_first_last_seen`.
+            vertices_list (list of list of tuples): A list of polygon vertex sets.
+            sample_rate (float): Fraction of devices in the sample, between 0 and 1.
+            presampled (bool): True if `df` was already sampled, e.g. in the MongoDB query.
+
+        Returns:
+            tuple: (result_df, summary_df). result_df is the per-device DataFrame of the sample;
+                   summary_df has the columns "area", "metric", "estimate", "lower_bound",
+                   "upper_bound" and "approximate".
+        """
+        if not presampled:
+            df = self.sample_by_climac(df, sample_rate)
+        result_df = self.calculate_first_last_seen(df, vertices_list)
+        if result_df.empty:
+            return result_df, pd.DataFrame()
+        result_df["approximate"] = True
+
+        def bounds(count, sketch_error=0.0):
+            estimate = count / sample_rate
+            sampling_error = math.sqrt((1 - sample_rate) / count) if count else 0.0
+            margin = 1.96 * math.sqrt(sampling_error ** 2 + sketch_error ** 2) * estimate
+            return round(estimate), max(0, round(estimate - margin)), round(estimate + margin)
+
+        rows = []
+        for index in range(1, len(vertices_list) + 1):
+            area_name = f'area{index}'
+            sketch = HyperLogLog()
+            sketch.add_many(df.loc[df[area_name + '_in'] == 'in', 'CLIMAC'])
+            rows.append((area_name, "devices", *bounds(sketch.count(), sketch.relative_error())))
+            for category, count in result_df[f"{area_name}_category"].value_counts(sort=False).items():
+                rows.append((area_name, f"category {category}", *bounds(int(count))))
+
+        valid_sequence = result_df
+        for i in range(1, len(vertices_list)):
+            current_area = valid_sequence[f'area{i}_first_seen']
+            next_area = valid_sequence[f'area{i+1}_first_seen']
+            valid_sequence = valid_sequence[current_area.notnull() & next_area.notnull() & (current_area < next_area)]
+            rows.append((f'area{i}->area{i+1}', "transitions", *bounds(len(valid_sequence))))
+
+        summary_df = pd.DataFrame(rows, columns=["area", "metric", "estimate", "lower_bound", "upper_bound"])
+        summary_df["approximate"] = True
+        logging.info(f"Approximate preview completed at sample rate {sample_rate}.")
+        return result_df, summary_df
+
+    def get_raster(self, vertices):
+        """
+        Returns the raster lookup table for a polygon, loading or building it on first use.
+
+        Args:
+            vertices (list of tuple): A list of tuples representing the polygon's vertices.
+
+        Returns:
+            PolygonRaster: The raster for the polygon at `raster_resolution`.
+        """
+        key = PolygonRaster.polygon_hash(vertices, self.raster_resolution)
+        if key not in self.rasters:
+            raster = PolygonRaster(vertices, self.raster_resolution)
+            raster.load_or_build(self.raster_cache_dir)
+            self.rasters[key] = raster
+        return self.rasters[key]
+
+    def extract_points(self, df):
+        """
+        Returns the coordinates of all readings as NumPy arrays.
+
+        DataFrames from the columnar fetch path already carry float "X" and "Y" columns, which are
+        returned without copying; otherwise every "POSITION" is parsed once with `parse_position`.
+
+        Args:
+            df (pd.DataFrame): Input DataFrame with either "X" and "Y" columns or a "POSITION" column.
+
+        Returns:
+            tuple: (xs, ys) as float64 NumPy arrays aligned with the rows of `df`.
+        """
+        if "X" in df.columns and "Y" in df.columns:
+            return df["X"].to_numpy(dtype=np.float64), df["Y"].to_numpy(dtype=np.float64)
+        points = np.array(df["POSITION"].map(self.parse_position).tolist(), dtype=np.float64).reshape(-1, 2)
+        return points[:, 0], points[:, 1]
+
+    def classify_areas(self, df, vertices_list):
+        """
+        Classifies every reading against all areas in one pass over the positions.
+
+        The coordinates are extracted once with `extract_points`. With `raster_resolution` set, points
+        are looked up in each area's raster and only points in boundary cells get an exact test;
+        otherwise only points inside an area's bounding box are passed to `is_point_in_polygon`.
+
+        Args:
+            df (pd.DataFrame): Input DataFrame with "X" and "Y" columns or a "POSITION" column.
+            vertices_list (list of list of tuples): A list of polygon vertex sets.
+
+        Returns:
+            pd.DataFrame: Boolean columns "area1" ... "areaK" aligned with the index of `df`.
+        """
+        px, py = self.extract_points(df)
+        membership = pd.DataFrame(index=df.index)
+        for index, vertices in enumerate(vertices_list, start=1):
+            if self.raster_resolution:
+                inside = self.get_raster(vertices).contains(px, py)
+            else:
+                xs = [vx for vx, _ in vertices]
+                ys = [vy for _, vy in vertices]
+                in_box = (px >= min(xs)) & (px <= max(xs)) & (py >= min(ys)) & (py <= max(ys))
+                candidates = np.nonzero(in_box)[0]
+                inside = np.zeros(len(px), dtype=bool)
+                inside[candidates] = [self.is_point_in_polygon(x, y, vertices)
+                                      for x, y in zip(px[candidates].tolist(), py[candidates].tolist())]
+            membership[f'area{index}'] = inside
+            logging.info(f"area{index} contains {int(inside.sum())} records post filter.")
+        return membership
+
+    def calculate_od_matrix(self, df, vertices_list, area_ids=None):
+        """
+        Calculate transit counts and transit-time distributions for every ordered pair of areas.
+
+        The readings are classified against all areas once. A device transits from an origin to a
+        destination when it is seen in both and its first seen time in the origin is earlier than in
+        the destination, the same rule `calculate_transitions_between_areas` applies along its chain.
+        The transit time is the destination first seen time minus the origin last seen time, in
+        minutes, floored at zero when the device was seen in both areas at once.
+
+        Args:
+            df (pd.DataFrame): Input DataFrame containing positional data. It should have at least the following columns:
+                - "WINDOW_START" (int or float): Unix timestamps in seconds indicating the start of observation.
+                - "CLIMAC" (str or int): Unique identifier for each observed entity.
+                - "POSITION" (str or dict): The position of the reading, or float "X" and "Y" columns.
+            vertices_list (list of list of tuples): A list of polygon vertex sets.
+            area_ids (list[int], optional): Unique IDs used to label the areas, in the order of
+                `vertices_list`. Defaults to 1..K.
+
+        Returns:
+            pd.DataFrame: One row per ordered (origin, destination) pair with the columns "origin_id",
+                          "destination_id", "transit_count", "transit_min", "transit_p25", "transit_median",
+                          "transit_p75", "transit_max", "transit_mean" and one count column per transit time
+                          category. If no data is given, returns an empty DataFrame.
+
+        Raises:
+            ValueError: If `area_ids` contains duplicates.
+        """
+        logging.info("Starting origin-destination matrix processing...")
+        if df.empty:
+            logging.warning("No data fetched from MongoDB. Exiting processing.")
+            return pd.DataFrame()
+        if area_ids is None:
+            area_ids = list(range(1, len(vertices_list) + 1))
+        if len(set(area_ids)) != len(area_ids):
+            raise ValueError(f"Area IDs of an origin-destination matrix must be unique: {area_ids}")
+
+        membership = self.classify_areas(df, vertices_list)
+        area_readings = []
+        for index, area_id in enumerate(area_ids, start=1):
+            area_in_df = df.loc[membership[f'area{index}'], ['CLIMAC', 'WINDOW_START']]
+            area_readings.append(area_in_df.assign(area_id=area_id))
+        seen = pd.concat(area_readings).groupby(['CLIMAC', 'area_id'])['WINDOW_START'].agg(['min', 'max'])
+        first_seen = seen['min'].unstack().reindex(columns=area_ids)
+        last_seen = seen['max'].unstack().reindex(columns=area_ids)
+
+        bins = [0, 1, 10, 20, 30, 40, 50, float("inf")]
+        labels = ["Just Seen", "1-9", "10-19", "20-29", "30-39", "40-49", "50+"]
+        category_columns = ["transit_" + label.lower().replace(" ", "_").replace("-", "_").replace("+", "_plus")
+                            for label in labels]
+
+        rows = []
+        for origin_id in area_ids:
+            for destination_id in area_ids:
+                if origin_id == destination_id:
+                    continue
+                origin_first = first_seen[origin_id]
+                destination_first = first_seen[destination_id]
+                condition = origin_first.notnull() & destination_first.notnull() & (origin_first < destination_first)
+                transit = ((destination_first[condition] - last_seen[origin_id][condition]) / 60).clip(lower=0)
+                row = {"origin_id": origin_id, "destination_id": destination_id, "transit_count": int(condition.sum())}
+                if transit.empty:
+                    row.update({"transit_min": None, "transit_p25": None, "transit_median": None,
+                                "transit_p75": None, "transit_max": None, "transit_mean": None})
+                else:
+                    row.update({"transit_min": transit.min(), "transit_p25": transit.quantile(0.25),
+                                "transit_median": transit.median(), "transit_p75": transit.quantile(0.75),
+                                "transit_max": transit.max(), "transit_mean": round(transit.mean(), 1)})
+                counts = pd.cut(transit, bins=bins, labels=labels, right=False).value_counts(sort=False)
+                row.update({column: int(counts[label]) for column, label in zip(category_columns, labels)})
+                rows.append(row)
+            logging.info(f"Transitions from area {origin_id} computed.")
+
+        logging.info(f"Origin-destination matrix completed for {len(area_ids)} areas.")
+        return pd.DataFrame(rows)
+
+    def calculate_partial_aggregates(self, df, vertices_list):
+        """
+        Calculate mergeable per-device aggregates for a slice of the readings.
+
+        Slices of the same case can be split by device or by time; their aggregates are combined
+        with `merge_partial_aggregates` and turned into the usual output with `finalize_aggregates`.
+
+        Args:
+            df (pd.DataFrame): Input DataFrame with the "CLIMAC" and "WINDOW_START" columns and either
+                "POSITION" or "X" and "Y".
+            vertices_list (list of list of tuples): A list of polygon vertex sets.
+
+        Returns:
+            pd.DataFrame: One row per device and area with the columns "CLIMAC", "area" (0 for the
+                          main area, 1..K for the polygons), "first_seen", "last_seen" (Unix seconds)
+                          and "count" (number of readings).
+        """
+        columns = ["CLIMAC", "area", "first_seen", "last_seen", "count"]
+        if df.empty:
+            return pd.DataFrame(columns=columns)
+
+        membership = self.classify_areas(df, vertices_list)
+        frames = []
+        for index in range(len(vertices_list) + 1):
+            area_in_df = df if index == 0 else df[membership[f'area{index}']]
+            aggregates = area_in_df.groupby('CLIMAC')['WINDOW_START'].agg(first_seen='min', last_seen='max', count='size')
+            frames.append(aggregates.reset_index().assign(area=index))
+        return pd.concat(frames, ignore_index=True)[columns]
+
+    @staticmethod
+    def merge_partial_aggregates(partials):
+        """
+        Merge partial aggregates computed on different slices of the readings.
+
+        Args:
+            partials (list of pd.DataFrame): Outputs of `calculate_partial_aggregates`.
+
+        Returns:
+            pd.DataFrame: The merged aggregates, in the same format.
+        """
+        merged = pd.concat(partials, ignore_index=True)
+        return (merged.groupby(['CLIMAC', 'area'])
+                .agg(first_seen=('first_seen', 'min'), last_seen=('last_seen', 'max'), count=('count', 'sum'))
+                .reset_index())
+
+    def finalize_aggregates(self, aggregates, area_count, sequence=False):
+        """
+        Turn merged aggregates into the output of `calculate_first_last_seen` or, with
+        `sequence=True`, of `calculate_transitions_between_areas`.
+
+        Args:
+            aggregates (pd.DataFrame): Merged aggregates from `merge_partial_aggregates`.
+            area_count (int): The number of polygon areas.
+            sequence (bool): Apply the sequence validation of `calculate_transitions_between_areas`.
+
+        Returns:
+            pd.DataFrame: The per-device result. If no aggregates are given, returns an empty DataFrame.
+        """
+        if aggregates.empty:
+            logging.warning("No aggregates to finalize. Exiting processing.")
+            return pd.DataFrame()
+
+        main = aggregates[aggregates['area'] == 0].set_index('CLIMAC')
+        result_df = pd.DataFrame({'CLIMAC': main.index})
+        if not sequence:
+            result_df['main_first_seen'] = pd.to_datetime(main['first_seen'], unit='s').values
+            result_df['main_last_seen'] = pd.to_datetime(main['last_seen'], unit='s').values
+            result_df['main_total'] = ((result_df['main_last_seen'] - result_df['main_first_seen'])
+                                       .dt.total_seconds().div(60).round().astype('Int64'))
+
+        bins = [0, 1, 10, 20, 30, 40, 50, float("inf")]
+        labels = ["Just Seen", "1-9", "10-19", "20-29", "30-39", "40-49", "50+"]
+        for index in range(1, area_count + 1):
+            area_name = f'area{index}'
+            area = (aggregates[aggregates['area'] == index].set_index('CLIMAC')
+                    .reindex(result_df['CLIMAC']).reset_index(drop=True))
+            result_df[f'{area_name}_first_seen'] = pd.to_datetime(area['first_seen'], unit='s')
+            result_df[f'{area_name}_last_seen'] = pd.to_datetime(area['last_seen'], unit='s')
+            result_df[f'{area_name}_total'] = area['count'].multiply(30).div(60).round().astype('Int64')
+            result_df[f"{area_name}_category"] = pd.cut(result_df[f"{area_name}_total"], bins=bins, labels=labels, right=False)
+
+        if not sequence:
+            return result_df.where(pd.notnull(result_df), None)
+
+        valid_sequence = result_df
+        for i in range(1, area_count):
+            current_area = f'area{i}_first_seen'
+            next_area = f'area{i+1}_first_seen'
+            condition = valid_sequence[current_area].notnull() & valid_sequence[next_area].notnull() & (valid_sequence[current_area] < valid_sequence[next_area])
+            valid_sequence = valid_sequence[condition]
+            logging.info(f"Valid sequences between area {i} and area {i+1}: {valid_sequence.shape[0]}")
+        return valid_sequence
@@ -1,9 +1,8 @@
 # Datamanipulations modules
-import pandas as pd
 import json
+from collections import Counter
 
 # Database modules
-import pymongo
 import sqlalchemy
 from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, DateTime, inspect, text
 from sqlalchemy.exc import SQLAlchemyError
@@ -11,14 +10,32 @@ from sqlalchemy.orm import sessionmaker
 
 # Debugging modules
 import logging
+import socket
+import time
+
+# pandas and pymongo are imported lazily inside the methods that use them,
+# so only the stages that need them pay their import cost.
+
+# Database settings. Distributed workers read them from their own copy of this module,
+# so credentials are never sent to the coordinator's task queue.
+DB_CONFIG = dict(
+    mongo_ip="127.0.0.1", mongo_port=27017, mongo_authSource="admin", mongo_username="cagri",
+    mongo_password="3541", mongo_database="wifi",
+    postgres_ip="127.0.0.1", postgres_port=5432, postgres_database="mydb", postgres_username="cagri",
+    postgres_password="3541"
+)
+MONGO_COLLECTION = "climac_positions_big"
 
 class DatabaseController:
     """
-    There are total 9 functions.
+    There are total 12 functions.
     functions names: 
         connect_to_mongodb
         connect_to_postgres
+        preflight_check
         fetch_data_from_mongo
+        fetch_columns_from_mongo
+        get_collection_stats
         fetch_from_postgres
         add_area_columns
         insert_and_return_case_id
@@ -48,7 +65,7 @@ class DatabaseController:
         self.mongo_collection = None
         self.postgres_engine = None
         
-    def connect_to_mongodb(self, collection_name):
+    def connect_to_mongodb(self, collection_name, timeout_ms=None):
         """
         Connect to a MongoDB database and access a specific collection.
 
@@ -58,23 +75,31 @@ class DatabaseController:
 
         Args:
             collection_name (str): The name of the MongoDB collection to connect to.
+            timeout_ms (int, optional): Server selection timeout in milliseconds.
+                Defaults to the driver's own timeout when not given.
 
         Returns:
             None: This method sets instance attributes for the MongoDB client, database,
             and collection, which can be used later in the program.
         """
         try: 
+            import pymongo
             logging.info(f"Connected mongo database: {self.mongo_database} and collection: {collection_name}.")
+            client_options = {}
+            if timeout_ms is not None:
+                client_options['serverSelectionTimeoutMS'] = timeout_ms
+                client_options['connectTimeoutMS'] = timeout_ms
             self.mongo_client = pymongo.MongoClient(
                 host=f"mongodb://{self.mongo_ip}:{self.mongo_port}/?authSource={self.mongo_authSource}", 
                 username=self.mongo_username, 
-                password=self.mongo_password)
+                password=self.mongo_password,
+                **client_options)
             self.mongo_db = self.mongo_client[self.mongo_database]
             self.mongo_collection = self.mongo_db[collection_name] 
         except Exception as e:
             logging.error(f"Failed to connect to MongoDB: {e}")
 
-    def connect_to_postgres(self):
+    def connect_to_postgres(self, timeout_seconds=None):
         """
         Establish a connection to the PostgreSQL database using SQLAlchemy.
 
@@ -83,17 +108,87 @@ class DatabaseController:
         attribute `postgres_engine` for further use. If the connection attempt fails, an error
         message is logged.
 
+        Args:
+            timeout_seconds (int, optional): Connection timeout passed to the driver.
+                Defaults to the driver's own timeout when not given.
+
         Returns:
             None: The function sets the `postgres_engine` instance attribute.
         """
         try:
             db_connection_str = f"postgresql://{self.postgres_username}:{self.postgres_password}@{self.postgres_ip}:{self.postgres_port}/{self.postgres_database}"
-            self.postgres_engine = create_engine(db_connection_str)
+            connect_args = {}
+            if timeout_seconds is not None:
+                connect_args['connect_timeout'] = timeout_seconds
+            self.postgres_engine = create_engine(db_connection_str, connect_args=connect_args)
             logging.info(f"Connected to PostgreSQL database: {self.postgres_database}")
         except Exception as e:
             logging.error(f"Failed to connected to PostgreSQL database: {self.postgres_database}")
 
-    def fetch_data_from_mongo(self, start_datetime=None, end_datetime=None):
+    def preflight_check(self, area_ids, required_tables=("area", "odcase", "wifi_main"), postgres_timeout_ms=None):
+        """
+        Validate connectivity, area IDs and required tables before a case is run.
+
+        This function pings MongoDB, opens a PostgreSQL connection, checks that the
+        required tables exist and that every requested area ID has coordinates in the
+        `area` table. It expects `connect_to_mongodb` to have been called with a short
+        timeout and `connect_to_postgres` to have been called first, so the check stays fast.
+
+        libpq does not accept connect timeouts below 2 seconds, so when `postgres_timeout_ms`
+        is given the PostgreSQL port is first probed with a plain socket and an unreachable
+        server is reported without waiting for the driver.
+
+        Args:
+            area_ids (list[int]): The area IDs the case will use.
+            required_tables (tuple[str]): PostgreSQL tables the pipeline writes to or reads from.
+            postgres_timeout_ms (int, optional): Timeout of the PostgreSQL port probe in milliseconds.
+
+        Returns:
+            dict: A dictionary with the keys "mongo", "postgres" (bool), "missing_tables",
+            "missing_area_ids" (lists), "area_error" (str or None, set when the area
+            coordinates could not be read), "elapsed" (float, seconds) and "ok" (bool).
+        """
+        start = time.perf_counter()
+        report = {"mongo": False, "postgres": False, "missing_tables": list(required_tables),
+                  "missing_area_ids": list(area_ids), "area_error": None, "elapsed": 0.0, "ok": False}
+
+        try:
+            self.mongo_client.admin.command("ping")
+            report["mongo"] = True
+        except Exception as e:
+            logging.error(f"Pre-flight: MongoDB is not reachable: {e}")
+
+        try:
+            if postgres_timeout_ms is not None:
+                socket.create_connection((self.postgres_ip, self.postgres_port), timeout=postgres_timeout_ms / 1000).close()
+            with self.postgres_engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            report["postgres"] = True
+        except Exception as e:
+            logging.error(f"Pre-flight: PostgreSQL is not reachable: {e}")
+
+        if report["postgres"]:
+            inspector = inspect(self.postgres_engine)
+            report["missing_tables"] = [t for t in required_tables if not inspector.has_table(t)]
+            for table_name in report["missing_tables"]:
+                logging.error(f"Pre-flight: required table '{table_name}' does not exist.")
+            if "area" not in report["missing_tables"]:
+                try:
+                    found = self.get_coordinates(list(area_ids))
+                    report["missing_area_ids"] = [area_id for area_id in area_ids if area_id not in found]
+                    for area_id in report["missing_area_ids"]:
+                        logging.error(f"Pre-flight: area ID {area_id} was not found in table 'area'.")
+                except Exception as e:
+                    report["area_error"] = str(e)
+                    logging.error(f"Pre-flight: failed to read area coordinates: {e}")
+
+        report["elapsed"] = time.perf_counter() - start
+        report["ok"] = (report["mongo"] and report["postgres"] and not report["missing_tables"]
+                        and not report["missing_area_ids"] and report["area_error"] is None)
+        logging.info(f"Pre-flight check finished in {report['elapsed']:.3f}s, ok: {report['ok']}")
+        return report
+
+    def fetch_data_from_mongo(self, start_datetime=None, end_datetime=None, sample_rate=None, shard=None):
         """
         Fetch data from the MongoDB collection within a specific datetime range.
 
@@ -101,27 +196,197 @@ class DatabaseController:
         (using the `WINDOW_START` field) and returns them as a Pandas DataFrame. It also limits the output
         to only the required fields: "CLIMAC", "WINDOW_START", and "POSITION".
 
+        The documents are read through `fetch_columns_from_mongo` when PyMongoArrow is installed, which
+        returns "X" and "Y" float columns instead of "POSITION"; otherwise they are read as Python dicts.
+
+        When `sample_rate` or `shard` is given, only a hash-based subset of devices is returned. The
+        subset is selected in the query with `$toHashedIndexKey` (MongoDB 7.0+). Older servers return the
+        whole range, still through `fetch_columns_from_mongo` when possible, and the devices are then
+        selected in Python by hashing each distinct "CLIMAC" once with `DataProcessor.climac_bucket`.
+
         Args:
             start_datetime (datetime, optional): The start of the datetime range to filter documents by.
             end_datetime (datetime, optional): The end of the datetime range to filter documents by.
+            sample_rate (float, optional): Fraction of devices to fetch, between 0 and 1.
+            shard (tuple[int, int], optional): (shard_index, shard_count); fetch only the devices
+                whose "CLIMAC" hash falls into this shard.
 
         Returns:
             DataFrame: A Pandas DataFrame containing the filtered documents from the MongoDB collection.
         """
+        import pandas as pd
+        from pymongo.errors import OperationFailure
+        from DataProcessor import DataProcessor, SAMPLE_BUCKETS
         query = {}
         if start_datetime and end_datetime:
             start_timestamp = int(start_datetime.timestamp())
             end_timestamp = int(end_datetime.timestamp())
             query['WINDOW_START'] = {'$gte': start_timestamp, '$lte': end_timestamp}
         fields = {"CLIMAC": 1, "WINDOW_START": 1, "POSITION": 1}
-        x = self.mongo_collection.find(query, fields)
-        df = pd.DataFrame(list(x))
+
+        def hashed_bucket(buckets):
+            return {'$abs': {'$mod': [{'$toHashedIndexKey': '$CLIMAC'}, buckets]}}
+
+        if sample_rate is not None and sample_rate < 1:
+            expr = {'$lt': [hashed_bucket(SAMPLE_BUCKETS), sample_rate * SAMPLE_BUCKETS]}
+            keep = lambda climac: DataProcessor.climac_in_sample(climac, sample_rate)
+        elif shard is not None and shard[1] > 1:
+            shard_index, shard_count = shard
+            expr = {'$eq': [hashed_bucket(shard_count), shard_index]}
+            keep = lambda climac: DataProcessor.climac_bucket(climac, shard_count) == shard_index
+        else:
+            expr, keep = None, None
+
+        match = dict(query, **{'$expr': expr}) if expr else query
+        try:
+            df = self.fetch_columns_from_mongo(match)
+            if df is None:
+                x = self.mongo_collection.find(match, fields)
+                df = pd.DataFrame(list(x))
+            if expr:
+                logging.info(f"Fetched a server-side device subset with sample rate {sample_rate} and shard {shard}.")
+        except OperationFailure as e:
+            if expr is None:
+                raise
+            logging.warning(f"Server-side device hashing is not supported ({e}); filtering devices in Python.")
+            df = self.fetch_columns_from_mongo(query)
+            if df is None:
+                x = self.mongo_collection.find(query, fields)
+                df = pd.DataFrame([doc for doc in x if keep(doc["CLIMAC"])])
+            elif not df.empty:
+                climacs = pd.Series(df["CLIMAC"].unique())
+                df = df[df["CLIMAC"].isin(climacs[climacs.map(keep)])].reset_index(drop=True)
+        return df
+
+    def fetch_columns_from_mongo(self, match):
+        """
+        Fetch matching documents as typed columns through PyMongoArrow.
+
+        The server projects "POSITION.X" and "POSITION.Y" to doubles and PyMongoArrow decodes the BSON
+        batches straight into Arrow buffers with a fixed schema, so no Python object is built per document.
+        "CLIMAC" is kept as an Arrow-backed string column; "WINDOW_START", "X" and "Y" are handed to the
+        DataFrame as NumPy arrays without copying.
+
+        Documents that do not fit the schema (e.g. "POSITION" stored as a string) are split off on the
+        server and only those are read as dicts, with their positions parsed into "X" and "Y", so no
+        document is transferred twice.
+
+        Args:
+            match (dict): The MongoDB filter to apply.
+
+        Returns:
+            DataFrame: A Pandas DataFrame with the columns "CLIMAC", "WINDOW_START", "X" and "Y", or None
+            if PyMongoArrow is not installed, in which case the caller should use the dict path.
+        """
+        try:
+            import pandas as pd
+            import pyarrow as pa
+            from pymongoarrow.api import Schema, aggregate_arrow_all
+        except ImportError:
+            logging.info("PyMongoArrow is not installed; fetching documents as dicts.")
+            return None
+        from DataProcessor import DataProcessor
+
+        schema = Schema({"CLIMAC": pa.string(), "WINDOW_START": pa.int64(), "X": pa.float64(), "Y": pa.float64()})
+        to_double = lambda field: {"$convert": {"input": field, "to": "double", "onError": None, "onNull": None}}
+        fits_schema = {"$and": [
+            {"$eq": [{"$type": "$CLIMAC"}, "string"]},
+            {"$in": [{"$type": "$WINDOW_START"}, ["int", "long"]]},
+            {"$ne": ["$X", None]},
+            {"$ne": ["$Y", None]},
+        ]}
+        projected = [
+            {"$match": match},
+            {"$project": {"_id": 0, "CLIMAC": 1, "WINDOW_START": 1, "POSITION": 1,
+                          "X": to_double("$POSITION.X"), "Y": to_double("$POSITION.Y")}},
+        ]
+
+        table = aggregate_arrow_all(
+            self.mongo_collection,
+            projected + [{"$match": {"$expr": fits_schema}}, {"$project": {"POSITION": 0}}],
+            schema=schema
+        )
+        df = pd.DataFrame({
+            "CLIMAC": pd.arrays.ArrowExtensionArray(table.column("CLIMAC")),
+            "WINDOW_START": table.column("WINDOW_START").to_numpy(),
+            "X": table.column("X").to_numpy(),
+            "Y": table.column("Y").to_numpy(),
+        }, copy=False)
+        logging.info(f"Fetched {len(df)} documents as columns through PyMongoArrow.")
+
+        rest = list(self.mongo_collection.aggregate(
+            projected + [{"$match": {"$expr": {"$not": [fits_schema]}}}, {"$project": {"X": 0, "Y": 0}}]
+        ))
+        if rest:
+            logging.info(f"{len(rest)} documents do not match the columnar schema; fetched them as dicts.")
+            rest_df = pd.DataFrame(rest)
+            points = rest_df["POSITION"].map(DataProcessor.parse_position)
+            rest_df["X"] = [x for x, _ in points]
+            rest_df["Y"] = [y for _, y in points]
+            df = pd.concat([df, rest_df.drop(columns="POSITION")], ignore_index=True)
         return df
 
+    def get_collection_stats(self, start_datetime, end_datetime, sample_size=10000):
+        """
+        Collect the statistics the planner needs to estimate the cost of a case.
+
+        The total comes from `estimated_document_count` and the average document size from `collStats`.
+        If an index starts with `WINDOW_START`, the documents in range are counted exactly with
+        `count_documents` and sampled after the range filter; otherwise a `$sample` of the whole
+        collection is taken and the count in range is extrapolated from it, so no full scan is run.
+
+        Args:
+            start_datetime (datetime): The start of the datetime range.
+            end_datetime (datetime): The end of the datetime range.
+            sample_size (int): Number of documents to sample for device statistics.
+
+        Returns:
+            dict: A dictionary with the keys "total_documents", "documents" (in range), "avg_document_size"
+            (bytes), "window_start_indexed" (bool), "sample_size" (sampled documents in range) and
+            "sample_device_counts" (list of readings per distinct device in the sample).
+        """
+        query = {'WINDOW_START': {'$gte': int(start_datetime.timestamp()), '$lte': int(end_datetime.timestamp())}}
+        total_documents = self.mongo_collection.estimated_document_count()
+
+        try:
+            coll_stats = self.mongo_db.command("collStats", self.mongo_collection.name)
+            avg_document_size = coll_stats.get("avgObjSize", 0)
+        except Exception as e:
+            logging.warning(f"collStats is not available ({e}); transfer size will not be estimated.")
+            avg_document_size = 0
+
+        window_start_indexed = any(
+            index['key'][0][0] == 'WINDOW_START' for index in self.mongo_collection.index_information().values()
+        )
+        if window_start_indexed:
+            documents = self.mongo_collection.count_documents(query)
+            pipeline = [{'$match': query}, {'$sample': {'size': sample_size}}, {'$project': {'_id': 0, 'CLIMAC': 1}}]
+            sample = list(self.mongo_collection.aggregate(pipeline))
+        else:
+            logging.warning("No index on WINDOW_START; estimating the range size from a sample.")
+            pipeline = [{'$sample': {'size': sample_size}}, {'$project': {'_id': 0, 'CLIMAC': 1, 'WINDOW_START': 1}}]
+            drawn = list(self.mongo_collection.aggregate(pipeline))
+            sample = [doc for doc in drawn
+                      if query['WINDOW_START']['$gte'] <= doc.get('WINDOW_START', -1) <= query['WINDOW_START']['$lte']]
+            documents = round(total_documents * len(sample) / len(drawn)) if drawn else 0
+
+        device_counts = Counter(doc.get('CLIMAC') for doc in sample)
+        logging.info(f"Collection stats: {documents} of {total_documents} documents in range, "
+                     f"{len(device_counts)} devices in a sample of {len(sample)}.")
+        return {
+            "total_documents": total_documents,
+            "documents": documents,
+            "avg_document_size": avg_document_size,
+            "window_start_indexed": window_start_indexed,
+            "sample_size": len(sample),
+            "sample_device_counts": list(device_counts.values()),
+        }
+
     def fetch_from_postgres(self, columns, start_datetime, end_datetime):
         """
         Fetches data from a PostgreSQL table, handling multiple columns and truncating datetime fields.
         """
+        import pandas as pd
         trunc_columns = []
         for column in columns:
             if 'first_seen' in column:
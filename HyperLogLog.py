@@ -0,0 +1,93 @@
+# Data manipulation modules
+import numpy as np
+import pandas as pd
+
+class HyperLogLog:
+    """
+    There are total 5 functions.
+        add_many
+        merge
+        count
+        relative_error
+        _hash_values
+    """
+    def __init__(self, precision=14):
+        """
+        Initializes an empty HyperLogLog sketch.
+
+        Args:
+            precision (int): Number of hash bits used to pick a register. The sketch keeps
+                2 ** precision one-byte registers; 14 gives 16384 registers (16 KB) and
+                a standard error of about 0.8%.
+        """
+        if not 4 <= precision <= 18:
+            raise ValueError("precision must be between 4 and 18")
+        self.precision = precision
+        self.num_registers = 1 << precision
+        self.registers = np.zeros(self.num_registers, dtype=np.uint8)
+
+    @staticmethod
+    def _hash_values(values):
+        """
+        Hashes values into unsigned 64-bit integers.
+
+        Args:
+            values (iterable): The values to hash, e.g. a pandas Series of "CLIMAC" values.
+
+        Returns:
+            np.ndarray: An array of uint64 hashes, one per value.
+        """
+        return pd.util.hash_pandas_object(pd.Series(values), index=False).to_numpy(dtype=np.uint64)
+
+    def add_many(self, values):
+        """
+        Adds values to the sketch. Duplicates do not change the estimate.
+
+        Args:
+            values (iterable): The values to add.
+        """
+        hashes = self._hash_values(values)
+        if hashes.size == 0:
+            return
+        remaining_bits = 64 - self.precision
+        index = (hashes >> np.uint64(remaining_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << remaining_bits) - 1)
+        # rest < 2 ** 50, so the float conversion is exact and frexp yields its bit length
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        rank = (remaining_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        """
+        Merges another sketch of the same precision into this one.
+
+        Args:
+            other (HyperLogLog): The sketch to merge.
+        """
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        """
+        Estimates the number of distinct values added to the sketch.
+
+        Returns:
+            float: The estimated cardinality.
+        """
+        m = self.num_registers
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros > 0:
+            estimate = m * np.log(m / zeros)
+        return float(estimate)
+
+    def relative_error(self):
+        """
+        Returns the standard relative error of the sketch, 1.04 / sqrt(m).
+
+        Returns:
+            float: The relative standard error.
+        """
+        return 1.04 / np.sqrt(self.num_registers)
@@ -0,0 +1,207 @@
+# Data manipulation modules
+import importlib.util
+import math
+
+# Debugging modules
+import logging
+
+# Rough per-row cost assumptions; tune them for the machine the cases run on
+DICT_ROW_BYTES = 700          # dict path: per-document dicts plus object columns
+COLUMNAR_ROW_BYTES = 120      # columnar path: CLIMAC string plus int64/float64 columns
+AREA_ROW_BYTES = 70           # per area and row: membership column and "in"/"out" labels
+AGGREGATE_ROW_BYTES = 120     # per device and area in the merged aggregates
+PROCESSING_OVERHEAD = 2.0     # copies made while converting, filtering and grouping
+FETCH_ROWS_PER_SECOND = 150000
+COLUMNAR_FETCH_ROWS_PER_SECOND = 1000000
+CLASSIFY_ROWS_PER_SECOND = 2000000
+
+# Streaming and time shards never use chunks shorter than this
+MIN_CHUNK_SECONDS = 60
+
+# Rough fixed cost of one distributed shard: connection, query start-up, result transfer
+SHARD_OVERHEAD_SECONDS = 1.0
+
+class Planner:
+    """
+    There are total 4 functions.
+        estimate_devices
+        estimate
+        choose_strategy
+        describe
+    """
+    IN_MEMORY = "in-memory"
+    STREAMING = "streaming"
+    SHARDED = "sharded"
+
+    def __init__(self, memory_budget_bytes, shard_runtime_seconds=1800, shard_timeout=1800, max_retries=2):
+        """
+        Initializes the Planner.
+
+        Args:
+            memory_budget_bytes (int): The most memory a run may use; larger runs are refused.
+            shard_runtime_seconds (int): Estimated runtimes above this recommend a sharded run.
+            shard_timeout (int): The `Coordinator` shard timeout sharded runs will use.
+            max_retries (int): The `Coordinator` retry limit sharded runs will use.
+        """
+        self.memory_budget_bytes = memory_budget_bytes
+        self.shard_runtime_seconds = shard_runtime_seconds
+        self.shard_timeout = shard_timeout
+        self.max_retries = max_retries
+
+    @staticmethod
+    def estimate_devices(documents, sample_size, sample_device_counts):
+        """
+        Estimates the number of distinct devices from a uniform sample of documents.
+
+        Uses the GEE estimator: devices seen once in the sample are scaled by sqrt(documents / sample_size),
+        devices seen more often are counted once.
+
+        Args:
+            documents (int): The number of documents in range.
+            sample_size (int): The number of sampled documents in range.
+            sample_device_counts (list[int]): Readings per distinct device in the sample.
+
+        Returns:
+            int: The estimated number of distinct devices.
+        """
+        if sample_size == 0:
+            return 0
+        if sample_size >= documents:
+            return len(sample_device_counts)
+        seen_once = sum(1 for count in sample_device_counts if count == 1)
+        seen_more = len(sample_device_counts) - seen_once
+        return min(documents, round(math.sqrt(documents / sample_size) * seen_once + seen_more))
+
+    def estimate(self, stats, num_areas, sample_rate=None):
+        """
+        Estimates documents, devices, transfer size, memory and runtime of a case.
+
+        Args:
+            stats (dict): The output of `DatabaseController.get_collection_stats`.
+            num_areas (int): The number of areas of the case.
+            sample_rate (float, optional): The device sample rate of an approximate preview.
+
+        Returns:
+            dict: A dictionary with the keys "documents", "devices", "transfer_bytes", "reading_bytes"
+            (memory for the readings held at once), "aggregate_bytes", "runtime_seconds" and "columnar".
+        """
+        rate = sample_rate or 1.0
+        documents = round(stats["documents"] * rate)
+        devices = round(self.estimate_devices(stats["documents"], stats["sample_size"], stats["sample_device_counts"]) * rate)
+        columnar = importlib.util.find_spec("pymongoarrow") is not None
+
+        row_bytes = (COLUMNAR_ROW_BYTES if columnar else DICT_ROW_BYTES) + AREA_ROW_BYTES * num_areas
+        fetch_rate = COLUMNAR_FETCH_ROWS_PER_SECOND if columnar else FETCH_ROWS_PER_SECOND
+        return {
+            "documents": documents,
+            "devices": devices,
+            "transfer_bytes": documents * stats["avg_document_size"],
+            "reading_bytes": documents * row_bytes * PROCESSING_OVERHEAD,
+            "aggregate_bytes": devices * (num_areas + 1) * AGGREGATE_ROW_BYTES,
+            "runtime_seconds": documents / fetch_rate + documents * num_areas / CLASSIFY_ROWS_PER_SECOND,
+            "columnar": columnar,
+        }
+
+    def choose_strategy(self, estimate, range_seconds, streamable=True, num_workers=1, time_shards=1):
+        """
+        Picks an execution strategy for a case and checks it against the memory budget.
+
+        A run with more than one worker is sharded; its time shards are raised to the smallest number
+        that fits the budget and lets every shard finish within `shard_timeout`. Sharded runs are
+        refused when even time shards of `MIN_CHUNK_SECONDS` do not fit, or when the shards would keep
+        the workers busy for longer than `shard_timeout * (max_retries + 1)`. Otherwise the case runs
+        in memory when it fits, and is split into sequential time chunks (streaming) when it does not.
+        Cases that cannot be streamed, or that do not fit even in chunks of `MIN_CHUNK_SECONDS`, are refused.
+
+        Args:
+            estimate (dict): The output of `estimate`.
+            range_seconds (float): Length of the datetime range in seconds.
+            streamable (bool): Whether the processing mode can run on partial aggregates.
+            num_workers (int): Worker processes requested by the user.
+            time_shards (int): Time shards per device shard requested by the user.
+
+        Returns:
+            dict: A dictionary with the keys "strategy", "chunks" (time chunks for streaming),
+            "time_shards" (time shards per device shard for a sharded run), "memory_bytes",
+            "queue_seconds" (estimated time the workers need for all shards of a sharded run),
+            "fits" (bool) and "recommendation" (str).
+        """
+        reading_bytes = estimate["reading_bytes"]
+        # The running merge keeps the merged aggregates and the next partial at once
+        aggregate_bytes = 2 * estimate["aggregate_bytes"]
+        max_chunks = max(1, int(range_seconds // MIN_CHUNK_SECONDS))
+
+        def fewest_chunks(resident_bytes):
+            """ Fewest time chunks whose readings fit next to `resident_bytes`, capped by the shortest chunk. """
+            room = self.memory_budget_bytes - resident_bytes
+            return max_chunks if room <= 0 else min(max_chunks, max(1, math.ceil(reading_bytes / room)))
+
+        chunks = 1
+        queue_seconds = 0.0
+        queue_limit = self.shard_timeout * (self.max_retries + 1)
+        if num_workers > 1 and streamable:
+            strategy = self.SHARDED
+            # The coordinator merges as shards arrive, while every worker holds its own partial
+            aggregate_bytes += estimate["aggregate_bytes"]
+            # Each shard must finish within the shard timeout
+            worker_seconds = estimate["runtime_seconds"] / num_workers
+            shard_budget = self.shard_timeout - SHARD_OVERHEAD_SECONDS
+            needed_for_time = max_chunks if shard_budget <= 0 else min(max_chunks, math.ceil(worker_seconds / shard_budget))
+            # All local workers run at once, so together they hold 1 / time_shards of the readings
+            time_shards = max(time_shards, fewest_chunks(aggregate_bytes), needed_for_time)
+            memory_bytes = reading_bytes / time_shards + aggregate_bytes
+            queue_seconds = worker_seconds + time_shards * SHARD_OVERHEAD_SECONDS
+        elif reading_bytes <= self.memory_budget_bytes or not streamable:
+            strategy = self.IN_MEMORY
+            memory_bytes = reading_bytes
+        else:
+            strategy = self.STREAMING
+            chunks = fewest_chunks(aggregate_bytes)
+            memory_bytes = reading_bytes / chunks + aggregate_bytes
+        if strategy != self.SHARDED:
+            time_shards = 1
+
+        fits_memory = memory_bytes <= self.memory_budget_bytes
+        fits_queue = queue_seconds <= queue_limit
+        fits = fits_memory and fits_queue
+        logging.info(f"Planned strategy: {strategy}, chunks: {chunks}, time shards: {time_shards}, "
+                     f"memory: {memory_bytes:.0f} bytes, queue: {queue_seconds:.0f}s, fits: {fits}.")
+        if not fits and not streamable:
+            recommendation = "Shorten the date range; this mode has to hold all readings in memory."
+        elif not fits_memory:
+            recommendation = "Shorten the date range or raise the memory budget."
+        elif not fits_queue:
+            recommendation = (f"The {time_shards} time shards per worker would take about {queue_seconds / 60:,.0f} min, "
+                              f"more than the shard timeout allows; shorten the date range or add workers.")
+        elif strategy != self.SHARDED and estimate["runtime_seconds"] > self.shard_runtime_seconds and streamable:
+            recommendation = "Consider running with several worker processes to shorten the runtime."
+        elif strategy == self.SHARDED:
+            recommendation = f"Run {strategy} with {time_shards} time shards per device shard."
+        else:
+            recommendation = f"Run {strategy}."
+        return {"strategy": strategy, "chunks": chunks, "time_shards": time_shards, "memory_bytes": memory_bytes,
+                "queue_seconds": queue_seconds, "fits": fits, "recommendation": recommendation}
+
+    def describe(self, estimate, plan):
+        """
+        Formats an estimate and plan for the user.
+
+        Args:
+            estimate (dict): The output of `estimate`.
+            plan (dict): The output of `choose_strategy`.
+
+        Returns:
+            str: A short multi-line summary.
+        """
+        mib = 1024 * 1024
+        strategy = plan["strategy"] + (f" ({plan['chunks']} chunks)" if plan["strategy"] == self.STREAMING else "")
+        return "\n".join([
+            f"Estimated documents: {estimate['documents']:,}",
+            f"Estimated devices: {estimate['devices']:,}",
+            f"Estimated transfer size: {estimate['transfer_bytes'] / mib:,.0f} MiB",
+            f"Estimated memory: {plan['memory_bytes'] / mib:,.0f} MiB "
+            f"(budget {self.memory_budget_bytes / mib:,.0f} MiB)",
+            f"Estimated runtime: {estimate['runtime_seconds'] / 60:,.1f} min",
+            f"Strategy: {strategy}",
+            plan["recommendation"],
+        ])
@@ -0,0 +1,209 @@
+# Data manipulation modules
+import numpy as np
+import hashlib
+import json
+import math
+import os
+import tempfile
+import zipfile
+
+# Debugging modules
+import logging
+
+class PolygonRaster:
+    """
+    There are total 6 functions.
+        polygon_hash
+        build
+        save
+        load
+        load_or_build
+        contains
+    """
+    OUTSIDE = 0
+    INSIDE = 1
+    BOUNDARY = 2
+
+    def __init__(self, vertices, resolution=256):
+        """
+        Initializes a raster over the bounding box of a polygon.
+
+        Args:
+            vertices (list of tuple): A list of tuples representing the polygon's vertices.
+            resolution (int): Number of cells along the longer side of the bounding box.
+        """
+        self.vertices = [(float(x), float(y)) for x, y in vertices]
+        self.resolution = resolution
+        xs = [x for x, _ in self.vertices]
+        ys = [y for _, y in self.vertices]
+        self.x0 = min(xs)
+        self.y0 = min(ys)
+        span = max(max(xs) - self.x0, max(ys) - self.y0) or 1.0
+        self.cell_size = span / resolution
+        self.cols = max(1, math.ceil((max(xs) - self.x0) / self.cell_size))
+        self.rows = max(1, math.ceil((max(ys) - self.y0) / self.cell_size))
+        self.cells = None
+
+    @staticmethod
+    def polygon_hash(vertices, resolution):
+        """
+        Returns a stable hash of a polygon and raster resolution, used as the cache key.
+
+        Args:
+            vertices (list of tuple): The polygon's vertices.
+            resolution (int): The raster resolution.
+
+        Returns:
+            str: A hex digest.
+        """
+        payload = json.dumps([[[float(x), float(y)] for x, y in vertices], resolution])
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def build(self):
+        """
+        Marks every cell as inside, outside or boundary.
+
+        A cell is boundary when any polygon edge touches it, found with Liang-Barsky clipping
+        against a slightly enlarged cell so rounding can only add boundary cells. Every other cell
+        lies entirely on one side of the polygon, so testing its center is enough. The centers are
+        tested for all cells at once, with the ray casting of `DataProcessor.is_point_in_polygon`
+        applied edge by edge to the rows the edge spans.
+        """
+        cells = np.full((self.rows, self.cols), self.OUTSIDE, dtype=np.uint8)
+        eps = self.cell_size * 1e-6
+        n = len(self.vertices)
+        for i in range(n):
+            (ax, ay), (bx, by) = self.vertices[i], self.vertices[(i + 1) % n]
+            c_min, c_max = self._cell_range(min(ax, bx), max(ax, bx), self.x0, self.cols)
+            r_min, r_max = self._cell_range(min(ay, by), max(ay, by), self.y0, self.rows)
+            rr, cc = np.meshgrid(np.arange(r_min, r_max + 1), np.arange(c_min, c_max + 1), indexing="ij")
+            x_min = self.x0 + cc * self.cell_size - eps
+            y_min = self.y0 + rr * self.cell_size - eps
+            x_max = x_min + self.cell_size + 2 * eps
+            y_max = y_min + self.cell_size + 2 * eps
+
+            t0 = np.zeros(rr.shape)
+            t1 = np.ones(rr.shape)
+            hit = np.ones(rr.shape, dtype=bool)
+            dx, dy = bx - ax, by - ay
+            for p, q in ((-dx, ax - x_min), (dx, x_max - ax), (-dy, ay - y_min), (dy, y_max - ay)):
+                if p == 0:
+                    hit &= q >= 0
+                elif p < 0:
+                    t0 = np.maximum(t0, q / p)
+                else:
+                    t1 = np.minimum(t1, q / p)
+            hit &= t0 <= t1
+            cells[rr[hit], cc[hit]] = self.BOUNDARY
+
+        center_x = self.x0 + (np.arange(self.cols) + 0.5) * self.cell_size
+        center_y = self.y0 + (np.arange(self.rows) + 0.5) * self.cell_size
+        inside = np.zeros((self.rows, self.cols), dtype=bool)
+        for i in range(n):
+            (ax, ay), (bx, by) = self.vertices[i - 1], self.vertices[i]
+            rows = np.nonzero((center_y > min(ay, by)) & (center_y <= max(ay, by)))[0]
+            if rows.size == 0:
+                continue
+            # Same crossing rule as is_point_in_polygon; horizontal edges span no rows
+            crossing = center_x[np.newaxis, :] <= max(ax, bx)
+            if ax != bx:
+                x_inters = (center_y[rows] - ay) * (bx - ax) / (by - ay) + ax
+                crossing = crossing & (center_x[np.newaxis, :] <= x_inters[:, np.newaxis])
+            inside[rows] ^= crossing
+        cells[inside & (cells != self.BOUNDARY)] = self.INSIDE
+        self.cells = cells
+        logging.info(f"Rasterized polygon into {self.rows}x{self.cols} cells, "
+                     f"{int(np.count_nonzero(cells == self.BOUNDARY))} boundary cells.")
+
+    def _cell_range(self, low, high, origin, count):
+        """ Returns the first and last cell index covering [low, high], padded by one cell. """
+        first = max(0, math.floor((low - origin) / self.cell_size) - 1)
+        last = min(count - 1, math.floor((high - origin) / self.cell_size) + 1)
+        return first, last
+
+    def save(self, path):
+        """
+        Saves the cells to a .npz file.
+
+        The file is written under a temporary name in the same directory and renamed into place,
+        so processes reading the cache never see a partially written raster.
+
+        Args:
+            path (str): The file path.
+        """
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".npz.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, cells=self.cells)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def load(self, path):
+        """
+        Loads the cells from a .npz file written by `save`.
+
+        Args:
+            path (str): The file path.
+
+        Raises:
+            ValueError: If the stored raster does not match this polygon's grid.
+        """
+        with np.load(path) as data:
+            cells = data["cells"]
+        if cells.shape != (self.rows, self.cols):
+            raise ValueError(f"Raster in {path} has shape {cells.shape}, expected {(self.rows, self.cols)}")
+        self.cells = cells
+
+    def load_or_build(self, cache_dir):
+        """
+        Loads the raster from the cache directory, or builds and saves it.
+
+        Args:
+            cache_dir (str): Directory holding one "<polygon hash>.npz" file per polygon.
+        """
+        path = os.path.join(cache_dir, self.polygon_hash(self.vertices, self.resolution) + ".npz")
+        if os.path.exists(path):
+            try:
+                self.load(path)
+                logging.info(f"Loaded polygon raster from {path}.")
+                return
+            except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+                logging.warning(f"Failed to load polygon raster from {path}, rebuilding: {e}")
+        self.build()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.save(path)
+
+    def contains(self, xs, ys):
+        """
+        Tests many points against the polygon.
+
+        Points in inside or outside cells are answered from the raster; only points in boundary
+        cells are passed to `DataProcessor.is_point_in_polygon`, so results match the exact test.
+
+        Args:
+            xs (np.ndarray): The x-coordinates of the points.
+            ys (np.ndarray): The y-coordinates of the points.
+
+        Returns:
+            np.ndarray: A boolean array, True where the point is inside the polygon.
+        """
+        from DataProcessor import DataProcessor
+
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        cols = np.floor((xs - self.x0) / self.cell_size)
+        rows = np.floor((ys - self.y0) / self.cell_size)
+        on_grid = ((xs >= self.x0) & (xs <= self.x0 + self.cols * self.cell_size)
+                   & (ys >= self.y0) & (ys <= self.y0 + self.rows * self.cell_size))
+        # Points on the far edge of the grid belong to the last cell
+        cols = np.clip(np.nan_to_num(cols), 0, self.cols - 1).astype(np.int64)
+        rows = np.clip(np.nan_to_num(rows), 0, self.rows - 1).astype(np.int64)
+
+        state = np.where(on_grid, self.cells[rows, cols], self.OUTSIDE)
+        result = state == self.INSIDE
+        boundary = np.nonzero(state == self.BOUNDARY)[0]
+        result[boundary] = [DataProcessor.is_point_in_polygon(x, y, self.vertices)
+                            for x, y in zip(xs[boundary].tolist(), ys[boundary].tolist())]
+        return result
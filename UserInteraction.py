@@ -4,15 +4,17 @@ import re
 
 class UserInteraction:
     """
-    There are total 10 functions
+    There are total 12 functions
         get_all_user_inputs
         get_processing_choice
         get_table_name
         get_case_description
         get_date_input
+        get_sample_rate
         get_graph_choice
         get_integer_input
         get_area_details
+        get_worker_details
         get_time_frame
         display_message
     """
@@ -32,13 +34,28 @@ class UserInteraction:
             self.input['end_datetime'] = self.get_date_input("Enter end date and time")
             self.input['num_areas'], self.input['area_ids'] = self.get_area_details() 
             self.input['table_name'] = self.get_table_name("Enter your new table name: ")
+            self.input['num_workers'], self.input['time_shards'] = self.get_worker_details()
             self.input['graph_choice'] = self.get_graph_choice()
         elif self.input["processing_choice"] == 2:
             self.input['start_datetime'] = self.get_date_input("Enter start date and time")
             self.input['end_datetime'] = self.get_date_input("Enter end date and time")
             self.input['num_areas'], self.input['area_ids'] = self.get_area_details() 
             self.input['case_description'] = self.get_case_description()
+            self.input['num_workers'], self.input['time_shards'] = self.get_worker_details()
             self.input['graph_choice'] = self.get_graph_choice()
+        elif self.input["processing_choice"] == 3:
+            self.input['num_areas'], self.input['area_ids'] = self.get_area_details()
+        elif self.input["processing_choice"] == 4:
+            self.input['start_datetime'] = self.get_date_input("Enter start date and time")
+            self.input['end_datetime'] = self.get_date_input("Enter end date and time")
+            self.input['num_areas'], self.input['area_ids'] = self.get_area_details()
+            self.input['sample_rate'] = self.get_sample_rate()
+            self.input['table_name'] = self.get_table_name("Enter your new table name for the preview: ")
+        elif self.input["processing_choice"] == 5:
+            self.input['start_datetime'] = self.get_date_input("Enter start date and time")
+            self.input['end_datetime'] = self.get_date_input("Enter end date and time")
+            self.input['num_areas'], self.input['area_ids'] = self.get_area_details()
+            self.input['case_description'] = self.get_case_description()
         return self.input
 
     def get_processing_choice(self):
@@ -51,10 +68,13 @@ class UserInteraction:
         print("Choose the processing type:")
         print("1: Standard area processing")
         print("2: Sequence-based processing (discard records not meeting sequence conditions)")
-        choice = self.get_integer_input("Enter your choice (1 or 2): ")
-        while choice not in [1, 2]:
-            print("Invalid choice. Please choose 1 or 2.")
-            choice = self.get_integer_input("Enter your choice (1 or 2): ")
+        print("3: Pre-flight check (validate connections, area IDs and tables only)")
+        print("4: Approximate preview (estimate devices, transitions and dwell categories from a device sample)")
+        print("5: Origin-destination matrix (transit counts and times for every ordered pair of areas)")
+        choice = self.get_integer_input("Enter your choice (1-5): ")
+        while choice not in [1, 2, 3, 4, 5]:
+            print("Invalid choice. Please choose 1, 2, 3, 4 or 5.")
+            choice = self.get_integer_input("Enter your choice (1-5): ")
         return choice
 
     def get_table_name(self, promt):
@@ -80,6 +100,18 @@ class UserInteraction:
             except ValueError:
                 print("Invalid format, please enter the date and time in the format YYYY-MM-DD HH:MM:SS.")
 
+    def get_sample_rate(self):
+        """ Collect the percentage of devices to sample and return it as a fraction. """
+        while True:
+            try:
+                percent = float(input("Enter the percentage of devices to sample (0-100]: "))
+            except ValueError:
+                print("Invalid input, please enter a number.")
+                continue
+            if 0 < percent <= 100:
+                return percent / 100
+            print("Invalid percentage, please enter a value greater than 0 and at most 100.")
+
     def get_graph_choice(self):
         """ Asks the user if they want to see the graph. """
         while True:
@@ -101,9 +133,27 @@ class UserInteraction:
         num_areas = self.get_integer_input("Enter the number of areas: ")
         ids = []
         for i in range(num_areas):
-            ids.append(self.get_integer_input(f"Type ID for area {i + 1}: "))
+            area_id = self.get_integer_input(f"Type ID for area {i + 1}: ")
+            while area_id in ids:
+                print(f"Area {area_id} was already entered, please type a different ID.")
+                area_id = self.get_integer_input(f"Type ID for area {i + 1}: ")
+            ids.append(area_id)
         return num_areas, ids
 
+    def get_worker_details(self):
+        """ Collect the number of worker processes and, for distributed runs, time shards. """
+        num_workers = self.get_integer_input("Enter the number of worker processes (1 runs in this process): ")
+        while num_workers < 1:
+            print("Invalid number, please enter at least 1.")
+            num_workers = self.get_integer_input("Enter the number of worker processes (1 runs in this process): ")
+        time_shards = 1
+        if num_workers > 1:
+            time_shards = self.get_integer_input("Enter the number of time shards per device shard: ")
+            while time_shards < 1:
+                print("Invalid number, please enter at least 1.")
+                time_shards = self.get_integer_input("Enter the number of time shards per device shard: ")
+        return num_workers, time_shards
+
     def get_time_frame(self):
         """ Collect start and end timestamps. """
         start = self.get_integer_input("Type start timestamp: ")
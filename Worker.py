@@ -0,0 +1,121 @@
+# Process and network modules
+import os
+import queue
+import sys
+from multiprocessing.managers import BaseManager
+
+# Debugging modules
+import logging
+
+# Remote workers read the coordinator's authkey from this environment variable
+AUTHKEY_ENV = "TRANSIT_COORDINATOR_AUTHKEY"
+
+class WorkerManager(BaseManager):
+    """ Client side of the coordinator's task and result queues. """
+
+WorkerManager.register('get_task_queue')
+WorkerManager.register('get_result_queue')
+
+class Worker:
+    """
+    There are total 2 functions.
+        run
+        process_shard
+    """
+    def __init__(self, address, authkey):
+        """
+        Initializes the Worker with the coordinator it pulls shards from.
+
+        Args:
+            address (tuple): (host, port) of the coordinator.
+            authkey (bytes): The shared key used to authenticate with the coordinator.
+        """
+        self.address = address
+        self.authkey = authkey
+        self.db_controller = None
+        self.processor = None
+
+    def run(self):
+        """
+        Pulls shards from the coordinator until it receives a stop signal or the coordinator goes away.
+
+        Each shard is announced on the result queue with the worker's pid before it is processed, so
+        the coordinator can hand it out again if this process dies. The partial aggregates, or the
+        error message if the shard failed, are then sent back on the result queue. The MongoDB client
+        is closed when the worker exits.
+        """
+        manager = WorkerManager(address=self.address, authkey=self.authkey)
+        manager.connect()
+        task_queue = manager.get_task_queue()
+        result_queue = manager.get_result_queue()
+        logging.info(f"Worker connected to coordinator at {self.address}.")
+
+        try:
+            while True:
+                try:
+                    task = task_queue.get(timeout=5)
+                except queue.Empty:
+                    continue
+                except (EOFError, ConnectionError):
+                    logging.info("Coordinator is gone, worker exiting.")
+                    return
+                if task is None:
+                    logging.info("Worker received stop signal.")
+                    return
+                pid = os.getpid()
+                result_queue.put({'shard_id': task['shard_id'], 'pid': pid, 'started': True})
+                try:
+                    partial = self.process_shard(task)
+                    result_queue.put({'shard_id': task['shard_id'], 'pid': pid, 'ok': True, 'partial': partial})
+                except Exception as e:
+                    logging.error(f"Shard {task['shard_id']} failed: {e}")
+                    result_queue.put({'shard_id': task['shard_id'], 'pid': pid, 'ok': False, 'error': str(e)})
+        finally:
+            if self.db_controller is not None and self.db_controller.mongo_client is not None:
+                self.db_controller.mongo_client.close()
+
+    def process_shard(self, task):
+        """
+        Fetches one shard from MongoDB and calculates its partial aggregates.
+
+        The database settings come from this machine's `DatabaseController.DB_CONFIG`; the task
+        never carries credentials. The MongoDB connection and the `DataProcessor`, with its loaded
+        rasters, are created on the first shard and reused for the following ones.
+
+        Args:
+            task (dict): The shard description sent by the coordinator, with the keys "shard_id",
+                "collection_name", "start_datetime", "end_datetime", "shard", "vertices_list" and
+                "raster_resolution".
+
+        Returns:
+            pd.DataFrame: The partial aggregates from `DataProcessor.calculate_partial_aggregates`.
+        """
+        from DatabaseController import DatabaseController, DB_CONFIG
+        from DataProcessor import DataProcessor
+
+        if self.db_controller is None:
+            self.db_controller = DatabaseController(**DB_CONFIG)
+        if self.db_controller.mongo_collection is None or self.db_controller.mongo_collection.name != task['collection_name']:
+            if self.db_controller.mongo_client is not None:
+                self.db_controller.mongo_client.close()
+            self.db_controller.connect_to_mongodb(task['collection_name'])
+        if self.processor is None or self.processor.raster_resolution != task['raster_resolution']:
+            self.processor = DataProcessor(raster_resolution=task['raster_resolution'])
+
+        df = self.db_controller.fetch_data_from_mongo(
+            start_datetime=task['start_datetime'], end_datetime=task['end_datetime'], shard=task['shard']
+        )
+        logging.info(f"Shard {task['shard_id']}: fetched {df.shape[0]} records.")
+        return self.processor.calculate_partial_aggregates(df, task['vertices_list'])
+
+def run_worker(address, authkey):
+    """ Entry point for worker processes started by the coordinator. """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    Worker(address, authkey).run()
+
+if __name__ == "__main__":
+    # Remote node usage: TRANSIT_COORDINATOR_AUTHKEY=<authkey> python Worker.py <coordinator_host> <coordinator_port>
+    if len(sys.argv) != 3 or not os.environ.get(AUTHKEY_ENV):
+        print(f"Usage: {AUTHKEY_ENV}=<authkey> python Worker.py <coordinator_host> <coordinator_port>")
+        sys.exit(1)
+    run_worker((sys.argv[1], int(sys.argv[2])), os.environ[AUTHKEY_ENV].encode())
@@ -1,14 +1,45 @@
 # Import necessary modules
+import time
+STARTUP_TIME = time.perf_counter()
+
 import datetime
-from DatabaseController import DatabaseController
-from DataProcessor import DataProcessor
+import os
 from UserInteraction import UserInteraction
-from Graph import Graph
 import logging
 
+# DatabaseController, DataProcessor and Graph pull in SQLAlchemy, pymongo, pandas
+# and matplotlib, so they are imported inside main() only when their stage runs.
+
 # Setup logging for debugging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Distributed execution settings. The coordinator only accepts workers from this machine, on a
+# free port, unless TRANSIT_COORDINATOR_HOST is set, e.g. to 0.0.0.0 for workers on other machines.
+COORDINATOR_ADDRESS = (
+    os.environ.get("TRANSIT_COORDINATOR_HOST", "127.0.0.1"),
+    int(os.environ.get("TRANSIT_COORDINATOR_PORT", 50000 if "TRANSIT_COORDINATOR_HOST" in os.environ else 0))
+)
+
+# Areas are classified with raster lookup tables of this resolution, cached per polygon
+RASTER_RESOLUTION = 512
+
+# odcase rows of origin-destination matrix cases start with this marker; their
+# result is written to the table "od_matrix_<case id>"
+OD_MATRIX_CASE_PREFIX = "[OD matrix] "
+
+# Runs whose estimated memory exceeds this budget are refused by the planner
+MEMORY_BUDGET_BYTES = 4 * 1024 ** 3
+
+# Sharded runs hand a shard out again when it fails or takes longer than the timeout; the
+# planner refuses sharded runs the workers could not finish within all those attempts
+SHARD_TIMEOUT_SECONDS = 1800
+SHARD_MAX_RETRIES = 2
+
+# Pre-flight check limits; the two connection timeouts share the budget
+PREFLIGHT_BUDGET_SECONDS = 1.0
+PREFLIGHT_MONGO_TIMEOUT_MS = 400
+PREFLIGHT_POSTGRES_TIMEOUT_MS = 400
+
 def main():
     """
     Orchestrates the data processing workflow from user input to database operations.
@@ -23,8 +54,14 @@ def main():
     5. Writing results to a PostgreSQL database.
     
     The function utilizes datetime inputs, handles multiple areas for data processing, and 
-    gives the user choice between standard and sequence-based processing. It logs all major 
-    steps and calculates the total execution time for performance monitoring.
+    gives the user choice between standard and sequence-based processing, a pre-flight check
+    that only validates connections, area IDs and tables, an approximate preview computed
+    from a sample of devices (written like standard processing, flagged as approximate, with
+    its estimates in a "_summary" table), or an origin-destination matrix over all selected areas.
+    Standard and sequence-based processing can also be sharded by device hash across worker
+    processes, or streamed in time chunks when the planner estimates that the case does not fit
+    the memory budget. It logs all major steps and calculates the startup and total execution time
+    for performance monitoring.
     
     Outputs:
         - Data is written to the PostgreSQL database if applicable.
@@ -39,36 +76,94 @@ def main():
     ###########                                     ###########
     ###########################################################
     """)
+    logging.info(f"Startup time: {time.perf_counter() - STARTUP_TIME:.3f}s")
 
     ui = UserInteraction()
     user_inputs = ui.get_all_user_inputs()
-    db_controller = DatabaseController(
-        mongo_ip="127.0.0.1", mongo_port=27017, mongo_authSource="admin", mongo_username="cagri",
-        mongo_password="3541", mongo_database="wifi",
-        postgres_ip="127.0.0.1", postgres_port=5432, postgres_database="mydb", postgres_username="cagri",
-        postgres_password="3541"
-    )
+
+    from DatabaseController import DatabaseController, DB_CONFIG, MONGO_COLLECTION
+    db_controller = DatabaseController(**DB_CONFIG)
   
+    if user_inputs['processing_choice'] == 3:
+        db_controller.connect_to_mongodb(MONGO_COLLECTION, timeout_ms=PREFLIGHT_MONGO_TIMEOUT_MS)
+        # libpq's smallest connect timeout; preflight_check probes the port within the budget first
+        db_controller.connect_to_postgres(timeout_seconds=2)
+        report = db_controller.preflight_check(user_inputs['area_ids'], postgres_timeout_ms=PREFLIGHT_POSTGRES_TIMEOUT_MS)
+        if report['elapsed'] > PREFLIGHT_BUDGET_SECONDS:
+            logging.warning(f"Pre-flight check took {report['elapsed']:.3f}s, over the {PREFLIGHT_BUDGET_SECONDS}s budget.")
+        ui.display_message(f"Pre-flight check {'passed' if report['ok'] else 'failed'} in {report['elapsed']:.3f}s.")
+        return
+
     logging.info("Starting main function")
     start_time = datetime.datetime.now()
 
-    db_controller.connect_to_mongodb("climac_positions_big")     
+    db_controller.connect_to_mongodb(MONGO_COLLECTION)     
     db_controller.connect_to_postgres()
     vertices_map = db_controller.get_coordinates(user_inputs['area_ids'])
-    df = db_controller.fetch_data_from_mongo(
-        start_datetime=user_inputs['start_datetime'], end_datetime=user_inputs['end_datetime']
+    vertices_list = [vertices_map[area_id] for area_id in user_inputs['area_ids'] if area_id in vertices_map]
+
+    # Estimate the cost of the case before fetching and pick an execution strategy
+    from Planner import Planner
+    planner = Planner(MEMORY_BUDGET_BYTES, shard_timeout=SHARD_TIMEOUT_SECONDS, max_retries=SHARD_MAX_RETRIES)
+    stats = db_controller.get_collection_stats(user_inputs['start_datetime'], user_inputs['end_datetime'])
+    estimate = planner.estimate(stats, len(vertices_list), sample_rate=user_inputs.get('sample_rate'))
+    plan = planner.choose_strategy(
+        estimate, (user_inputs['end_datetime'] - user_inputs['start_datetime']).total_seconds(),
+        streamable=user_inputs['processing_choice'] in [1, 2],
+        num_workers=user_inputs.get('num_workers', 1), time_shards=user_inputs.get('time_shards', 1)
     )
-    logging.info(f"Fetched data from MongoDB: {df.shape[0]} records found.")
+    ui.display_message(planner.describe(estimate, plan))
+    if not plan['fits']:
+        logging.error(f"Refusing to run this case: {plan['recommendation']}")
+        return
 
-    if not df.empty:
-        vertices_list = [vertices_map[area_id] for area_id in user_inputs['area_ids'] if area_id in vertices_map]
-        processor = DataProcessor() 
+    from DataProcessor import DataProcessor
+    processor = DataProcessor(raster_resolution=RASTER_RESOLUTION)
 
+    # Sharded and streaming runs return merged partial aggregates instead of raw readings
+    aggregated = plan['strategy'] in [Planner.SHARDED, Planner.STREAMING]
+    if plan['strategy'] == Planner.SHARDED:
+        from Coordinator import Coordinator
+        from Worker import AUTHKEY_ENV
+        coordinator = Coordinator(
+            MONGO_COLLECTION, vertices_list, address=COORDINATOR_ADDRESS,
+            device_shards=user_inputs['num_workers'], time_shards=plan['time_shards'],
+            max_retries=SHARD_MAX_RETRIES, shard_timeout=SHARD_TIMEOUT_SECONDS, raster_resolution=RASTER_RESOLUTION
+        )
+        if COORDINATOR_ADDRESS[0] not in ["127.0.0.1", "localhost"]:
+            ui.display_message(f"Remote workers can join with: {AUTHKEY_ENV}={coordinator.authkey.decode()} "
+                               f"python Worker.py <this host> {COORDINATOR_ADDRESS[1]}")
+        df = coordinator.run(user_inputs['start_datetime'], user_inputs['end_datetime'],
+                             num_local_workers=user_inputs['num_workers'])
+        logging.info(f"Merged partial aggregates from workers: {df.shape[0]} rows.")
+    elif plan['strategy'] == Planner.STREAMING:
+        from Coordinator import Coordinator
+        df = None
+        time_slices = Coordinator.split_time_range(user_inputs['start_datetime'], user_inputs['end_datetime'], plan['chunks'])
+        for chunk, (chunk_start, chunk_end) in enumerate(time_slices, start=1):
+            chunk_df = db_controller.fetch_data_from_mongo(start_datetime=chunk_start, end_datetime=chunk_end)
+            partial = processor.calculate_partial_aggregates(chunk_df, vertices_list)
+            df = partial if df is None else processor.merge_partial_aggregates([df, partial])
+            logging.info(f"Chunk {chunk}/{len(time_slices)}: {chunk_df.shape[0]} records, {df.shape[0]} aggregate rows.")
+    else:
+        df = db_controller.fetch_data_from_mongo(
+            start_datetime=user_inputs['start_datetime'], end_datetime=user_inputs['end_datetime'],
+            sample_rate=user_inputs.get('sample_rate')
+        )
+        logging.info(f"Fetched data from MongoDB: {df.shape[0]} records found.")
+
+    if not df.empty:
         if user_inputs["processing_choice"] == 1:
-            processed_df = processor.calculate_first_last_seen(df, vertices_list)
+            if aggregated:
+                processed_df = processor.finalize_aggregates(df, len(vertices_list))
+            else:
+                processed_df = processor.calculate_first_last_seen(df, vertices_list)
             db_controller.write_to_postgres_flexible(processed_df, table_name=user_inputs["table_name"])
         elif user_inputs['processing_choice'] == 2:
-            processed_df = processor.calculate_transitions_between_areas(df, vertices_list)
+            if aggregated:
+                processed_df = processor.finalize_aggregates(df, len(vertices_list), sequence=True)
+            else:
+                processed_df = processor.calculate_transitions_between_areas(df, vertices_list)
             if not processed_df.empty:
                 case_id = db_controller.insert_and_return_case_id(
                     user_inputs['case_description'],
@@ -86,10 +181,34 @@ def main():
         
             if user_inputs['graph_choice'] == "Y":
                 visualization_data = db_controller.fetch_from_postgres(processed_df.columns)
+                from Graph import Graph
                 graph = Graph(visualization_data)
                 graph.plot_multiple_area_distributions()
             else:
                 logging.info("Skipping graph generation.")
+        elif user_inputs['processing_choice'] == 4:
+            processed_df, summary_df = processor.preview_areas(df, vertices_list, user_inputs['sample_rate'], presampled=True)
+            if not processed_df.empty:
+                ui.display_message(summary_df.to_string(index=False))
+                db_controller.write_to_postgres_flexible(processed_df, table_name=user_inputs["table_name"])
+                db_controller.write_to_postgres_flexible(summary_df, table_name=f"{user_inputs['table_name']}_summary")
+        elif user_inputs['processing_choice'] == 5:
+            area_ids = [area_id for area_id in user_inputs['area_ids'] if area_id in vertices_map]
+            processed_df = processor.calculate_od_matrix(df, vertices_list, area_ids)
+            if not processed_df.empty:
+                # An OD matrix has no single origin; the marker tells it apart from sequence cases
+                case_id = db_controller.insert_and_return_case_id(
+                    OD_MATRIX_CASE_PREFIX + user_inputs['case_description'],
+                    area_ids[0],
+                    area_ids[1:],
+                    user_inputs['start_datetime'],
+                    user_inputs['end_datetime']
+                )
+                if case_id is not None:
+                    processed_df['case_id'] = case_id
+                    db_controller.write_to_postgres_flexible(processed_df, table_name=f"od_matrix_{case_id}")
+                else:
+                    logging.error("Failed to obtain case_id; the OD matrix won't be written.")
         
         else:
             logging.info("Processed DataFrame is empty, nothing to write to PostgreSQL.")
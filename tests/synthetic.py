@@ -0,0 +1,36 @@
+""" Synthetic readings shared by the tests. """
+import datetime
+
+import numpy as np
+import pandas as pd
+
+START = datetime.datetime(2024, 5, 1, 8, 0, 0)
+END = datetime.datetime(2024, 5, 1, 10, 0, 0)
+VERTICES_LIST = [
+    [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0)],
+    [(20.0, 0.0), (30.0, 0.0), (25.0, 10.0)],
+    [(0.0, 20.0), (10.0, 20.0), (10.0, 30.0), (5.0, 25.0), (0.0, 30.0)],
+]
+
+
+def make_readings(devices=150, seed=7):
+    """ Random 30 second readings of devices wandering between the areas. """
+    rng = np.random.default_rng(seed)
+    start_ts = int(START.timestamp())
+    end_ts = int(END.timestamp())
+    frames = []
+    for device in range(devices):
+        count = int(rng.integers(5, 60))
+        frames.append(pd.DataFrame({
+            "CLIMAC": f"device-{device:04d}",
+            "WINDOW_START": np.sort(rng.choice(np.arange(start_ts, end_ts + 1, 30), count, replace=False)),
+            "X": rng.uniform(-2, 32, count),
+            "Y": rng.uniform(-2, 32, count),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def normalized(df):
+    """ Sorts by device and represents every missing value as None, so results can be compared. """
+    df = df.sort_values("CLIMAC").reset_index(drop=True).astype(object)
+    return df.where(pd.notnull(df), None)
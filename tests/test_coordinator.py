@@ -0,0 +1,109 @@
+import multiprocessing
+import os
+import sys
+import time
+import types
+
+import pandas as pd
+import pytest
+
+from Coordinator import Coordinator
+from DataProcessor import DataProcessor
+from synthetic import END, START, VERTICES_LIST, make_readings, normalized
+
+# Workers must inherit the stand-in DatabaseController module, which only forked processes do
+pytestmark = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(),
+                                reason="needs the fork start method")
+
+
+def fake_database_module(readings, marker_dir, inject_failures=True, delay=0.0):
+    """
+    A stand-in DatabaseController module serving `readings` from memory after `delay` seconds.
+
+    With `inject_failures`, the first attempt of device shard 0 in the first time slice raises, and
+    the first attempt of device shard 1 in the first time slice kills its worker process. Creating a
+    second controller in the same worker process fails, since workers must reuse their connection.
+    """
+    module = types.ModuleType("DatabaseController")
+    module.DB_CONFIG = {}
+    module.MONGO_COLLECTION = "readings"
+
+    def first_attempt(name):
+        try:
+            os.close(os.open(os.path.join(marker_dir, name), os.O_CREAT | os.O_EXCL))
+            return True
+        except FileExistsError:
+            return False
+
+    class DatabaseController:
+        def __init__(self, **kwargs):
+            if not first_attempt(f"controller-{os.getpid()}"):
+                raise RuntimeError("worker created a second DatabaseController")
+            self.mongo_client = None
+            self.mongo_collection = None
+
+        def connect_to_mongodb(self, collection_name, timeout_ms=None):
+            self.mongo_client = types.SimpleNamespace(close=lambda: None)
+            self.mongo_collection = types.SimpleNamespace(name=collection_name)
+
+        def fetch_data_from_mongo(self, start_datetime=None, end_datetime=None, sample_rate=None, shard=None):
+            shard_index, shard_count = shard
+            time.sleep(delay)
+            if inject_failures and start_datetime == START and shard_index == 0 and first_attempt("fail"):
+                raise RuntimeError("forced shard failure")
+            if inject_failures and start_datetime == START and shard_index == 1 and first_attempt("die"):
+                os._exit(1)
+            in_range = readings["WINDOW_START"].between(int(start_datetime.timestamp()), int(end_datetime.timestamp()))
+            in_shard = readings["CLIMAC"].map(lambda climac: DataProcessor.climac_bucket(climac, shard_count) == shard_index)
+            return readings[in_range & in_shard].copy()
+
+    module.DatabaseController = DatabaseController
+    return module
+
+
+def run_distributed(monkeypatch, tmp_path, readings):
+    monkeypatch.setitem(sys.modules, "DatabaseController", fake_database_module(readings, str(tmp_path)))
+    coordinator = Coordinator("readings", VERTICES_LIST, device_shards=3, time_shards=2, shard_timeout=600,
+                              start_method="fork")
+    started = time.monotonic()
+    aggregates = coordinator.run(START, END, num_local_workers=3)
+    # A shard lost with its worker is handed out again at once, not after the shard timeout
+    assert time.monotonic() - started < 120
+    assert os.path.exists(tmp_path / "fail") and os.path.exists(tmp_path / "die")
+    return aggregates
+
+
+def test_distributed_run_matches_calculate_first_last_seen(monkeypatch, tmp_path):
+    readings = make_readings()
+    aggregates = run_distributed(monkeypatch, tmp_path, readings)
+
+    processor = DataProcessor()
+    expected = processor.calculate_first_last_seen(readings.copy(), VERTICES_LIST)
+    result = processor.finalize_aggregates(aggregates, len(VERTICES_LIST))
+    pd.testing.assert_frame_equal(normalized(result), normalized(expected))
+
+
+def test_distributed_run_matches_calculate_transitions_between_areas(monkeypatch, tmp_path):
+    readings = make_readings()
+    aggregates = run_distributed(monkeypatch, tmp_path, readings)
+
+    processor = DataProcessor()
+    expected = processor.calculate_transitions_between_areas(readings.copy(), VERTICES_LIST)
+    result = processor.finalize_aggregates(aggregates, len(VERTICES_LIST), sequence=True)
+    assert not expected.empty
+    pd.testing.assert_frame_equal(normalized(result), normalized(expected))
+
+
+def test_shard_timeout_does_not_count_time_in_the_queue(monkeypatch, tmp_path):
+    readings = make_readings()
+    # 24 shards of 0.3s on 2 workers wait far longer than the timeout before they start
+    monkeypatch.setitem(sys.modules, "DatabaseController",
+                        fake_database_module(readings, str(tmp_path), inject_failures=False, delay=0.3))
+    coordinator = Coordinator("readings", VERTICES_LIST, device_shards=2, time_shards=12, shard_timeout=1.5,
+                              start_method="fork")
+    aggregates = coordinator.run(START, END, num_local_workers=2)
+
+    processor = DataProcessor()
+    expected = processor.calculate_first_last_seen(readings.copy(), VERTICES_LIST)
+    result = processor.finalize_aggregates(aggregates, len(VERTICES_LIST))
+    pd.testing.assert_frame_equal(normalized(result), normalized(expected))
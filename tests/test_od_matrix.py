@@ -0,0 +1,40 @@
+import itertools
+
+import pandas as pd
+import pytest
+
+from DataProcessor import DataProcessor
+from synthetic import VERTICES_LIST, make_readings
+
+
+def test_od_matrix_matches_single_pair_transitions():
+    readings = make_readings(devices=400, seed=5)
+    processor = DataProcessor()
+    area_ids = [11, 22, 33]
+    matrix = processor.calculate_od_matrix(readings.copy(), VERTICES_LIST, area_ids).set_index(["origin_id", "destination_id"])
+    assert len(matrix) == len(area_ids) * (len(area_ids) - 1)
+    # The transit time category counts follow "transit_mean"
+    category_columns = matrix.columns[matrix.columns.get_loc("transit_mean") + 1:]
+    assert len(category_columns) == 7
+
+    for (origin, origin_id), (destination, destination_id) in itertools.permutations(enumerate(area_ids), 2):
+        pair = processor.calculate_transitions_between_areas(readings.copy(), [VERTICES_LIST[origin], VERTICES_LIST[destination]])
+        row = matrix.loc[(origin_id, destination_id)]
+        assert row["transit_count"] == len(pair)
+        assert row["transit_count"] > 0
+
+        transit = ((pair["area2_first_seen"] - pair["area1_last_seen"]).dt.total_seconds() / 60).clip(lower=0)
+        assert row["transit_min"] == pytest.approx(transit.min())
+        assert row["transit_median"] == pytest.approx(transit.median())
+        assert row["transit_max"] == pytest.approx(transit.max())
+        assert row[category_columns].sum() == len(pair)
+
+
+def test_od_matrix_rejects_duplicate_area_ids():
+    readings = make_readings(devices=20)
+    with pytest.raises(ValueError):
+        DataProcessor().calculate_od_matrix(readings, VERTICES_LIST[:2] + VERTICES_LIST[:1], [1, 2, 1])
+
+
+def test_od_matrix_of_no_readings_is_empty():
+    assert DataProcessor().calculate_od_matrix(pd.DataFrame(), VERTICES_LIST).empty
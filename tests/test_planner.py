@@ -0,0 +1,85 @@
+import importlib.util
+
+import pytest
+
+from Planner import MIN_CHUNK_SECONDS, Planner
+
+GIB = 1024 ** 3
+DAY = 24 * 60 * 60
+
+
+@pytest.fixture
+def planner():
+    return Planner(4 * GIB, shard_timeout=1800, max_retries=2)
+
+
+def estimate_for(planner, documents, devices=100000, num_areas=2, monkeypatch=None):
+    """ The dict-path estimate of a case with `devices` devices, each seen more than once in the sample. """
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+    stats = {"documents": documents, "sample_size": documents, "sample_device_counts": [2] * devices,
+             "avg_document_size": 200}
+    return planner.estimate(stats, num_areas)
+
+
+def test_small_case_runs_in_memory(planner, monkeypatch):
+    estimate = estimate_for(planner, 1000000, monkeypatch=monkeypatch)
+    plan = planner.choose_strategy(estimate, DAY)
+    assert plan["strategy"] == Planner.IN_MEMORY
+    assert plan["fits"] and plan["memory_bytes"] == estimate["reading_bytes"]
+
+
+def test_large_case_is_streamed_in_chunks_that_fit(planner, monkeypatch):
+    estimate = estimate_for(planner, 50000000, monkeypatch=monkeypatch)
+    plan = planner.choose_strategy(estimate, 30 * DAY)
+    assert plan["strategy"] == Planner.STREAMING
+    assert plan["fits"] and plan["memory_bytes"] <= planner.memory_budget_bytes
+    # One chunk fewer would not fit
+    fewer = estimate["reading_bytes"] / (plan["chunks"] - 1) + 2 * estimate["aggregate_bytes"]
+    assert fewer > planner.memory_budget_bytes
+
+
+def test_sharded_run_raises_time_shards_and_counts_the_coordinator_merge(planner, monkeypatch):
+    estimate = estimate_for(planner, 50000000, devices=2000000, monkeypatch=monkeypatch)
+    plan = planner.choose_strategy(estimate, 30 * DAY, num_workers=4, time_shards=2)
+    assert plan["strategy"] == Planner.SHARDED and plan["fits"]
+    assert plan["time_shards"] > 2
+    # Merged aggregates and the next partial on the coordinator, plus one partial per worker
+    resident = 3 * estimate["aggregate_bytes"]
+    assert plan["memory_bytes"] == pytest.approx(estimate["reading_bytes"] / plan["time_shards"] + resident)
+    assert plan["memory_bytes"] <= planner.memory_budget_bytes
+    assert plan["queue_seconds"] <= planner.shard_timeout * (planner.max_retries + 1)
+
+
+def test_sharded_run_gets_time_shards_that_finish_within_the_timeout(monkeypatch):
+    planner = Planner(1024 * GIB, shard_timeout=60, max_retries=2)
+    estimate = estimate_for(planner, 50000000, monkeypatch=monkeypatch)
+    plan = planner.choose_strategy(estimate, 30 * DAY, num_workers=4)
+    assert plan["fits"]
+    shard_seconds = estimate["runtime_seconds"] / 4 / plan["time_shards"]
+    assert shard_seconds < planner.shard_timeout
+
+
+def test_sharded_run_is_refused_when_the_queue_outlasts_the_retries(planner, monkeypatch):
+    estimate = estimate_for(planner, 5000000000, monkeypatch=monkeypatch)
+    plan = planner.choose_strategy(estimate, 365 * DAY, num_workers=4)
+    assert plan["strategy"] == Planner.SHARDED
+    assert plan["memory_bytes"] <= planner.memory_budget_bytes
+    assert plan["queue_seconds"] > planner.shard_timeout * (planner.max_retries + 1)
+    assert not plan["fits"]
+    assert "add workers" in plan["recommendation"]
+
+
+def test_case_that_cannot_be_streamed_is_refused(planner, monkeypatch):
+    estimate = estimate_for(planner, 50000000, monkeypatch=monkeypatch)
+    plan = planner.choose_strategy(estimate, 30 * DAY, streamable=False, num_workers=4)
+    assert plan["strategy"] == Planner.IN_MEMORY
+    assert not plan["fits"]
+    assert "hold all readings in memory" in plan["recommendation"]
+
+
+def test_case_is_refused_when_even_the_shortest_chunks_do_not_fit(planner, monkeypatch):
+    estimate = estimate_for(planner, 50000000, monkeypatch=monkeypatch)
+    plan = planner.choose_strategy(estimate, 10 * MIN_CHUNK_SECONDS)
+    assert plan["strategy"] == Planner.STREAMING and plan["chunks"] == 10
+    assert not plan["fits"]
+    assert "memory budget" in plan["recommendation"]
@@ -0,0 +1,63 @@
+import math
+import os
+
+import numpy as np
+import pytest
+
+from DataProcessor import DataProcessor
+from PolygonRaster import PolygonRaster
+
+
+def star(points=30):
+    return [(50 + (40 if i % 2 else 15) * math.cos(math.pi * i / points),
+             50 + (40 if i % 2 else 15) * math.sin(math.pi * i / points)) for i in range(2 * points)]
+
+
+POLYGONS = {
+    "star": star(),
+    "concave": [(0, 0), (100, 0), (100, 100), (60, 100), (60, 30), (40, 30), (40, 100), (0, 100)],
+    "sliver": [(0, 0), (100, 1), (100, 1.5), (0, 0.2)],
+}
+
+
+def sample_points(vertices, count=200000, seed=3):
+    """ Random points around the polygon, plus its vertices and points on its edges. """
+    rng = np.random.default_rng(seed)
+    xs = np.array([x for x, _ in vertices], dtype=float)
+    ys = np.array([y for _, y in vertices], dtype=float)
+    px = rng.uniform(xs.min() - 5, xs.max() + 5, count)
+    py = rng.uniform(ys.min() - 5, ys.max() + 5, count)
+    t = rng.random(1000)
+    edge = rng.integers(0, len(vertices), 1000)
+    following = (edge + 1) % len(vertices)
+    px[:1000] = xs[edge] + t * (xs[following] - xs[edge])
+    py[:1000] = ys[edge] + t * (ys[following] - ys[edge])
+    px[1000:1000 + len(vertices)] = xs
+    py[1000:1000 + len(vertices)] = ys
+    return px, py
+
+
+@pytest.mark.parametrize("name", sorted(POLYGONS))
+def test_contains_matches_is_point_in_polygon(name):
+    vertices = POLYGONS[name]
+    raster = PolygonRaster(vertices, resolution=512)
+    raster.build()
+    px, py = sample_points(raster.vertices)
+
+    expected = np.array([DataProcessor.is_point_in_polygon(x, y, raster.vertices)
+                         for x, y in zip(px.tolist(), py.tolist())])
+    np.testing.assert_array_equal(raster.contains(px, py), expected)
+
+
+@pytest.mark.parametrize("content", [b"", b"PK\x03\x04truncated"])
+def test_load_or_build_rebuilds_a_broken_cache_file(tmp_path, content):
+    raster = PolygonRaster(POLYGONS["concave"], resolution=64)
+    path = tmp_path / (PolygonRaster.polygon_hash(raster.vertices, raster.resolution) + ".npz")
+    path.write_bytes(content)
+
+    raster.load_or_build(str(tmp_path))
+
+    cached = PolygonRaster(POLYGONS["concave"], resolution=64)
+    cached.load(str(path))
+    np.testing.assert_array_equal(cached.cells, raster.cells)
+    assert os.listdir(tmp_path) == [path.name]
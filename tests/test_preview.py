@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from DataProcessor import DataProcessor
+from HyperLogLog import HyperLogLog
+from synthetic import VERTICES_LIST, make_readings
+
+
+@pytest.mark.parametrize("distinct", [100, 5000, 200000])
+def test_hyperloglog_count_is_within_three_standard_errors(distinct):
+    sketch = HyperLogLog()
+    values = [f"device-{i}" for i in range(distinct)]
+    # Duplicates must not change the estimate
+    sketch.add_many(values + values[: distinct // 2])
+    assert abs(sketch.count() - distinct) <= 3 * sketch.relative_error() * distinct
+
+
+def test_hyperloglog_merge_counts_the_union():
+    left, right, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    left.add_many([f"device-{i}" for i in range(0, 60000)])
+    right.add_many([f"device-{i}" for i in range(40000, 100000)])
+    union.add_many([f"device-{i}" for i in range(0, 100000)])
+    left.merge(right)
+    np.testing.assert_array_equal(left.registers, union.registers)
+    with pytest.raises(ValueError):
+        left.merge(HyperLogLog(precision=10))
+
+
+def test_preview_bounds_contain_the_exact_values():
+    readings = make_readings(devices=3000, seed=11)
+    processor = DataProcessor()
+    exact = processor.calculate_first_last_seen(readings.copy(), VERTICES_LIST)
+    transitions = processor.calculate_transitions_between_areas(readings.copy(), VERTICES_LIST)
+    result_df, summary_df = processor.preview_areas(readings.copy(), VERTICES_LIST, sample_rate=0.5)
+
+    assert result_df["approximate"].all() and summary_df["approximate"].all()
+    assert set(exact.columns) <= set(result_df.columns)
+    assert 0 < result_df.shape[0] < exact.shape[0]
+
+    expected = {}
+    for index in range(1, len(VERTICES_LIST) + 1):
+        area_name = f"area{index}"
+        expected[(area_name, "devices")] = int(exact[f"{area_name}_first_seen"].notnull().sum())
+        for category, count in exact[f"{area_name}_category"].value_counts(sort=False).items():
+            expected[(area_name, f"category {category}")] = int(count)
+    expected[("area1->area2", "transitions")] = int(
+        (exact["area1_first_seen"].notnull() & exact["area2_first_seen"].notnull()
+         & (exact["area1_first_seen"] < exact["area2_first_seen"])).sum())
+    expected[(f"area{len(VERTICES_LIST) - 1}->area{len(VERTICES_LIST)}", "transitions")] = len(transitions)
+
+    checked = 0
+    for row in summary_df.itertuples():
+        value = expected[(row.area, row.metric)]
+        # 95% intervals are only meaningful for counts that are not tiny
+        if value >= 50 or value == 0:
+            assert row.lower_bound <= value <= row.upper_bound, (row, value)
+            checked += 1
+    assert checked == len(summary_df)